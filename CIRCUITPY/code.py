@@ -1,30 +1,49 @@
 #Import libraries for keys and LEDs. MacroHandler gets the HID libraries.
 import time
-from pmk import PMK
+from pmk import PMK, PRESS, RELEASE
 from pmk.platform.keybow2040 import Keybow2040 as Hardware
-from macro_handler import MacroHandler
+from macro_handler import MacroHandler, MacroQueue
+from layer_display import LayerDisplay
+from config_compiler import compile_layers, compile_combos, compile_encoder_actions, compile_button_actions
+from tap_hold import TapHoldResolver
+from combos import ComboEngine
+from adafruit_hid.consumer_control_code import ConsumerControlCode
+import scheduler
 
 #Import libraries to support the OLED module
 import board
 import busio
-from adafruit_ssd1306 import SSD1306_I2C
+from i2c_bus import BusManager, LEDS, DISPLAY, REGISTER_WRITES, SSD1306_WRITES
+from partial_ssd1306 import PartialSSD1306_I2C
 
 #Import libraries to support the rotary encoder module
 from adafruit_seesaw.seesaw import Seesaw
-from adafruit_seesaw.digitalio import DigitalIO
-from adafruit_seesaw.rotaryio import IncrementalEncoder
 from adafruit_seesaw.neopixel import NeoPixel
+from encoder_service import EncoderService, TURN, CLICK, DOUBLE, HOLD
 
 #Import libraries to support MIDI events
 import usb_midi
-from adafruit_midi import MIDI
+from midi_output import MidiOutput
 
 # Import custom configuration from config.py which contains all the editable bits.
 from config import (
     BRIGHTNESS,
     INACTIVITY_TIMEOUT,
+    ENCODER_ACCELERATION,
+    ENCODER_BUTTON_ACTIONS,
+    KEY_SCAN_RATE,
+    ENCODER_RATE,
+    DISPLAY_RATE,
+    HOUSEKEEPING_RATE,
+    MACRO_QUEUE_DEPTH,
+    MACRO_REPORT_DELAY,
+    BUS_SLICE_BYTES,
+    TAP_HOLD_TIME,
+    PERMISSIVE_HOLD,
+    COMBO_WINDOW,
     colours,
     layers,
+    combos,
     encoder_actions,
     layer_labels_map,
     spanish_char,
@@ -45,13 +64,19 @@ try:
 finally:
     i2c.unlock()
 
-# Start up the OLED module
-oled = SSD1306_I2C(128, 64, i2c, addr=0x3D)
+# From here on the bus manager owns the bus and every driver goes through it.
+# Switch and encoder transactions go out at once; LED and OLED writes are
+# queued, merged, and sent a slice at a time by the key scan task.
+i2c = BusManager(i2c, slice_bytes=BUS_SLICE_BYTES)
+i2c.configure(0x74, LEDS, REGISTER_WRITES)  # IS31FL3731 key LEDs
+i2c.configure(0x3D, DISPLAY, SSD1306_WRITES)  # OLED
+
+# Start up the OLED module. show() only sends the regions that changed.
+oled = PartialSSD1306_I2C(128, 64, i2c, addr=0x3D)
 oled.fill(0)
 oled.text("Display Ready", 0, 0, 1)
 oled.show()
 print("[OK] OLED display")
-time.sleep(2)
 
 # Initialize Keybow and MacroHandler
 keybow = PMK(Hardware(i2c=i2c))
@@ -59,127 +84,168 @@ keys = keybow.keys
 macro_comm = MacroHandler()
 print("[OK] Keybow and MacroHandler")
 
-# Initialize Rotary Encoder and NeoPixel on Seesaw
+# Initialize Rotary Encoder and NeoPixel on Seesaw. If the encoder's INT pin
+# is wired to the Keybow's INT header, pass int_pin=board.INT and the encoder
+# is only read after it signals a change; otherwise it is polled every 10ms.
 encoder = Seesaw(i2c, addr=0x36)
-encoder_button = DigitalIO(encoder, 24)
-rotary_encoder = IncrementalEncoder(encoder)
-last_position = rotary_encoder.position
+encoder_service = EncoderService(encoder, button_pin=24, int_pin=None, poll_interval=1 / ENCODER_RATE)
 neopixel = NeoPixel(encoder, 6, 1, brightness=BRIGHTNESS)
 print("[OK] Rotary encoder and NeoPixel")
 
-# Initialize MIDI on USB
-midi = MIDI(midi_out=usb_midi.ports[1], out_channel=1)
+# Initialize MIDI on USB. Messages are written out once per key scan tick.
+midi = MidiOutput(usb_midi.ports[1], channel=1)
 print("[OK] USB MIDI on MIDI channel 1")
 
+# Compile the layers and encoder actions into per-layer tables of ready-to-call
+# actions. Bad macros in config.py are reported here, at boot.
+macro_comm.add_handler("MIDI", midi.send, compiler=midi.compile)  # Messages become bytes here, at boot
+# Key actions are stepwise, so a long macro types one report at a time from
+# the macro queue task while the other tasks keep running.
+key_actions = compile_layers(layers, macro_comm, num_keys=len(keys), stepwise=True)
+# Combos become a bitmask lookup table per layer
+combo_table = compile_combos(combos, len(key_actions), macro_comm, num_keys=len(keys), stepwise=True)
+macro_queue = MacroQueue(macro_comm, max_depth=MACRO_QUEUE_DEPTH, report_delay=MACRO_REPORT_DELAY)
+# Each encoder handler takes the detents turned and their speed; the
+# default volume macros send one report per step, at most 50 steps a second.
+encoder_table = compile_encoder_actions(
+    encoder_actions,
+    len(key_actions),
+    macro_comm,
+    ("MEDIA", ConsumerControlCode.VOLUME_INCREMENT),  # Default to volume up
+    ("MEDIA", ConsumerControlCode.VOLUME_DECREMENT),  # Default to volume down
+    acceleration=ENCODER_ACCELERATION,
+    # ("MIDI_CC", cc, min, max, step): a controller value kept here, sent by midi.flush()
+    encoder_types={"MIDI_CC": lambda *mapping: midi.controller(*mapping).turn},
+)
+# Layer changes for encoder button clicks, double clicks and holds
+button_table = compile_button_actions(ENCODER_BUTTON_ACTIONS, len(key_actions))
+button_gestures = {CLICK: "click", DOUBLE: "double", HOLD: "hold"}
+print("[OK] Layers and encoder actions compiled")
+
 current_layer = 0
 last_activity_time = time.monotonic()
-oled_active = True
-
-# Display large layer number on changes
-def display_large_layer_text(layer):
-    oled.fill(0)
-    text = str(layer)
-
-    # Define pixel size and spacing for each block
-    pixel_size = 8
-    x_offset = 48  # Adjust to center the number horizontally
-    y_offset = 16  # Adjust to center vertically
-
-    if text in numbers_bitmap:
-        bitmap = numbers_bitmap[text]
-        
-        for row, line in enumerate(bitmap):
-            for col, pixel in enumerate(line):
-                if pixel == "1":
-                    x = x_offset + col * pixel_size
-                    y = y_offset + row * pixel_size
-                    oled.fill_rect(x, y, pixel_size, pixel_size, 1)
-
-    oled.show()
-    time.sleep(1)
+
+# Shows the large layer number on changes, then the key labels. The switch
+# from numeral to labels happens in layer_display.update() in the main loop,
+# so scanning keeps running while the numeral is on screen. Both screens of
+# every layer fit in the cache, so each is only drawn once.
+layer_display = LayerDisplay(oled, layer_labels_map, numbers_bitmap, cache_size=2 * len(layers))
 
 # Display Key Labels on OLED
 def update_oled_layer_display(layer):
-    display_large_layer_text(layer)
-    oled.fill(0)
-    oled.show()
-    layer_labels = layer_labels_map.get(layer, {i: "" for i in range(16)})
-    for col in range(4):
-        for row in range(4):
-            key_index = col * 4 + (3 - row)
-            label_text = layer_labels.get(key_index, "")
-            oled.text(label_text, col * 32, row * 16, 1)  # (for 128x64)
-    oled.show()
+    layer_display.show_layer(layer)
 
 def sleep_oled():
-    global oled_active
-    oled.fill(0)
-    oled.show()
-    oled_active = False
+    layer_display.sleep()
     print("OLED is very sleepy.")
 
 def wake_oled():
-    global oled_active
-    if not oled_active:
-        update_oled_layer_display(current_layer)
+    layer_display.wake()
+
+def change_layer(layer):
+    # Redraw only when the layer really changes, e.g. not for a jump to the current layer
+    global current_layer
+    if layer != current_layer:
+        current_layer = layer
+        update_oled_layer_display(layer)
+        update_leds_for_layer(layer)
 
 def update_leds_for_layer(layer):
+    # Set each key once, so unchanged LEDs are skipped by Key.set_led()
     for k in range(16):
-        keys[k].set_led(0, 0, 0)
-    for k in layers[layer].keys():
-        keys[k].set_led(*colours[layer])
+        if key_actions[layer][k] is not None:
+            keys[k].set_led(*colours[layer])
+        else:
+            keys[k].set_led(0, 0, 0)
     neopixel.fill(colours[layer])
+    encoder_service.restart_read()  # The fill selected a NeoPixel register
 
 # Sets the initial LED and OLED display for Layer 0
 update_oled_layer_display(current_layer)
 update_leds_for_layer(current_layer)
 
-# Main Loop
-print("[OK] All good. Starting Main Loop.")
-while True:
+# Queues a key's macro for sending. Pressing a key again while its macro
+# is still typing cancels it.
+def send_key_macro(k, action):
+    if not macro_queue.enqueue(action(), source=k):  # MIDI messages go through the "MIDI" handler added above
+        print(f"Key {k} macro cancelled or queue full ({macro_queue.depth} queued)")
+
+# Tap/hold keys are decided here, from key presses and releases and the
+# time; every other key's macro is passed straight on to the queue.
+tap_hold = TapHoldResolver(send_key_macro, hold_time=TAP_HOLD_TIME, permissive_hold=PERMISSIVE_HOLD)
+
+def key_pressed(k, event_time):
+    global last_activity_time
+    action = key_actions[current_layer][k]
+    if action is not None:
+        wake_oled()  # Wake OLED on activity
+        last_activity_time = event_time
+        print(f"Key {k} pressed in Layer {current_layer}")
+        tap_hold.press(k, action, event_time)
+
+def combo_pressed(action, mask, event_time):
+    global last_activity_time
+    wake_oled()
+    last_activity_time = event_time
+    print(f"Combo {mask:#06x} pressed in Layer {current_layer}")
+    send_key_macro(("combo", mask), action)
+
+# Key presses go through the combo engine first; keys in none of the
+# layer's combos pass straight through to the tap/hold resolver.
+combo_engine = ComboEngine(key_pressed, tap_hold.release, combo_pressed, window=COMBO_WINDOW)
+
+# Key scan task: debounced key events queue their macros for sending.
+# Macros fire once per press, not on every scan while the key is held.
+def scan_keys(now):
     keybow.update()
-    current_time = time.monotonic()
-
-   # Check for encoder rotation
-    position = rotary_encoder.position
-    if position > last_position:  # Encoder rotated up
-        # Check if current layer has an 'encoder-up' action defined
-        if current_layer in encoder_actions and "encoder-up" in encoder_actions[current_layer]:
-            encoder_actions[current_layer]["encoder-up"]()  # Execute layer-specific up action
-        else:
-            macro_comm.send_macro(("MEDIA", ConsumerControlCode.VOLUME_INCREMENT))  # Default to volume up
-        last_position = position
-
-    elif position < last_position:  # Encoder rotated down
-        # Check if current layer has an 'encoder-down' action defined
-        if current_layer in encoder_actions and "encoder-down" in encoder_actions[current_layer]:
-            encoder_actions[current_layer]["encoder-down"]()  # Execute layer-specific down action
-        else:
-            macro_comm.send_macro(("MEDIA", ConsumerControlCode.VOLUME_DECREMENT))  # Default to volume down
-        last_position = position
-
-
-    # Encoder button press handling for layer switching...
-    if not encoder_button.value:
-        current_layer = (current_layer + 1) % len(layers)
-        update_oled_layer_display(current_layer)
-        update_leds_for_layer(current_layer)
-
-
-    # Keypress handler
-    for k in layers[current_layer].keys():
-        if keys[k].pressed:
-            wake_oled()  # Wake OLED on activity
-            last_activity_time = current_time
-            print(f"Key {k} pressed in Layer {current_layer}")
-            macro_type, macro_data = layers[current_layer][k]
-
-            # Check macro type to handle MIDI separately
-            if macro_type == "MIDI":
-                midi.send(macro_data)
-            else:
-                macro_comm.send_macro((macro_type, macro_data))
-
-    # Check for OLED sleep mode
-    if oled_active and (current_time - last_activity_time > INACTIVITY_TIMEOUT):
+    event = keybow.get_event()
+    while event is not None:
+        k, event_type, event_time = event
+        if event_type == PRESS:
+            combo_engine.press(k, combo_table[current_layer], event_time)
+        elif event_type == RELEASE:
+            combo_engine.release(k, event_time)
+        event = keybow.get_event()
+    combo_engine.update(now)  # Keys waiting for the rest of a combo go on alone once it's too late
+    tap_hold.update(now)  # Holds fire once held long enough, without waiting for the release
+
+# Encoder task. Turns and button gestures arrive as events; the encoder is
+# only read over I2C when it has changed or a poll is due. Ticks without a
+# turn send the steps of a fast spin held back by the rate limit, unless
+# the layer has changed since.
+def poll_encoder(now):
+    encoder_service.update(now)
+    event = encoder_service.get_event()
+    turned = False
+    while event is not None:
+        kind, value, event_time = event
+        if kind == TURN:  # Every detent since the last turn event, up if positive
+            encoder_table[current_layer](value, encoder_service.velocity)
+            turned = True
+        elif button_gestures.get(kind) in button_table:  # One layer change per gesture
+            change_layer(button_table[button_gestures[kind]](current_layer))
+        event = encoder_service.get_event()
+    if not turned:
+        encoder_table[current_layer](0, encoder_service.velocity)
+
+# Display task: finish any pending layer display change
+def update_display(now):
+    layer_display.update(now)
+
+# Housekeeping task: OLED sleep mode
+def housekeeping(now):
+    if layer_display.active and (now - last_activity_time > INACTIVITY_TIMEOUT):
         sleep_oled()
+
+# Main Loop. Start-up LED and OLED writes have nothing to wait for, so send them all now.
+i2c.flush()
+print("[OK] All good. Starting Main Loop.")
+scheduler.run(
+    (KEY_SCAN_RATE, scan_keys),
+    (KEY_SCAN_RATE, midi.flush),  # One MIDI port write per tick
+    (KEY_SCAN_RATE, i2c.service),  # One slice of queued LED and OLED writes per tick
+    (ENCODER_RATE, poll_encoder),
+    (DISPLAY_RATE, update_display),
+    (HOUSEKEEPING_RATE, housekeeping),
+    macro_queue.run(),  # Macro output, one report per step
+)
@@ -13,6 +13,34 @@ macro_comm = MacroHandler()
 # Configuration options
 BRIGHTNESS = 0.25  # NeoPixel and LED brightness
 INACTIVITY_TIMEOUT = 30  # OLED sleep timeout in seconds
+# Main loop task rates, in runs per second
+KEY_SCAN_RATE = 1000
+ENCODER_RATE = 200
+DISPLAY_RATE = 30
+HOUSEKEEPING_RATE = 1
+# Macro output: most macros queued at once, and least seconds between HID reports
+MACRO_QUEUE_DEPTH = 8
+MACRO_REPORT_DELAY = 0
+# I2C: most queued LED and OLED bytes sent per key scan tick, which bounds
+# how long a display update can hold up a switch or encoder read
+BUS_SLICE_BYTES = 64
+# Tap/hold keys ({"tap": macro, "hold": macro} in layers): seconds held for the hold
+# macro, and whether tapping another key meanwhile makes it a hold straight away
+TAP_HOLD_TIME = 0.2
+PERMISSIVE_HOLD = False
+# Combos: most seconds between the first and last key of a combo
+COMBO_WINDOW = 0.05
+# Encoder acceleration: (detents per second, steps per detent), slowest first,
+# or None for one step per detent. For example, to double the steps from 10
+# detents a second and quadruple them from 20:
+# ENCODER_ACCELERATION = ((0, 1), (10, 2), (20, 4))
+ENCODER_ACCELERATION = None
+# Encoder button: "next" or "previous" layer, or jump straight to a layer number
+ENCODER_BUTTON_ACTIONS = {
+    "click": "next",     # Short press
+    "double": 0,         # Two short presses; the first one still acts as a click
+    "hold": "previous",  # Held for over 0.6 seconds
+}
 
 # Character Map with Platform Support (adafruit_hid only supports US layout; macro_handler can use UTF-16)
 # These are Spanish-specific, but other sections could be added for other languages.
@@ -55,7 +83,7 @@ layers = {
         0: ("KEY", Keycode.ZERO), 4: ("KEY", Keycode.KEYPAD_PERIOD), 8: ("KEY", Keycode.DELETE),12: ("KEY", Keycode.ENTER)
         },
     1: {
-        3: ("TEXT", " lang=\"es\""),
+        3: ("TEXT", " lang=\"es\""), 7: {"tap": ("TEXT", "<em>"), "hold": ("TEXT", "</em>")},  # Tap for one macro, hold for another
         2: ("TEXT", "<strong>"), 6: ("TEXT", "</strong>"),
         1: ("TEXT", "<span lang=\"es\">"), 5: ("TEXT", "</span>"),
         0: ("TEXT", " target=\"_blank\"")
@@ -68,12 +96,22 @@ layers = {
         },
     3: {
         3: ("KEY", Keycode.SPACE),
+        7: ("MIDI", NoteOn(60, 100), NoteOn(64, 100), NoteOn(67, 100)),  # C major chord; MIDI takes any number of messages
+        11: ("MIDI", [NoteOff(60, 0), NoteOff(64, 0), NoteOff(67, 0)]),  # ...or a list of them
         2: ("KEY", Keycode.T), 6: ("MIDI", ControlChange(7, 100)),  # Control Change for volume control, value 100
         1: ("KEY", Keycode.D), 5: ("MIDI", NoteOff(60, 0)),     # Send NoteOff for middle C
         0: ("KEY", Keycode.X), 4: ("MIDI", NoteOn(60, 120))   # Send NoteOn for middle C with velocity 120
         }
 }
 
+# Combos: keys pressed together, within COMBO_WINDOW, send the combo's macro instead of their own.
+# Keys in a combo wait up to COMBO_WINDOW before sending their own macro; other keys don't wait.
+combos = {
+    1: {
+        (2, 6): ("TEXT", "<strong></strong>"),  # STR and /STR together
+        },
+}
+
 # Layer Labels for OLED Display
 # Keybow2040 numbers from 0 at bottom left and continues bottom-to-top and left-to-right to 15 at top right.
 layer_labels_map = {
@@ -84,7 +122,7 @@ layer_labels_map = {
         0: "0", 4: ".", 8: "Del", 12: "Enter",
         },
     1: {
-        3: "LNG",
+        3: "LNG", 7: "EM|/EM",
         2: "STR", 6: "/STR",
         1: "<LNG>", 5: "</LNG>",
         0: "TGT"
@@ -96,7 +134,7 @@ layer_labels_map = {
         0: "'o", 4: "'O", 8: "?", 12: "!"
         },
     3: {
-        3: "Space",
+        3: "Space", 7: "Chord", 11: "ChOff",
         2: "T", 6: "CCvol",
         1: "D", 5: "C4off",
         0: "X", 4: "C4on"
@@ -104,22 +142,25 @@ layer_labels_map = {
 }
 
 # Encoder actions per layer, defined separately from layers. Default is volume-up and volume-down.
+# Each action is a macro, sent once per step, or a function(steps, velocity) called once per turn
+# with the number of steps (after ENCODER_ACCELERATION) and the speed in detents per second.
+# A layer can use "encoder": function(delta, velocity) instead, with delta negative for down,
+# or "encoder": ("MIDI_CC", cc, min, max, step) to turn the knob into a MIDI controller.
 encoder_actions = {
     0: {
-        "encoder-up": lambda: print("Layer 1 Encoder Up"),
-        "encoder-down": lambda: print("Layer 1 Encoder Down")
+        "encoder-up": lambda steps, velocity: print(f"Layer 1 Encoder Up x{steps}"),
+        "encoder-down": lambda steps, velocity: print(f"Layer 1 Encoder Down x{steps}")
         },
     1: {
-        "encoder-up": lambda: print("Layer 1 Encoder Up"),
-        "encoder-down": lambda: print("Layer 1 Encoder Down")
+        "encoder-up": lambda steps, velocity: print(f"Layer 1 Encoder Up x{steps}"),
+        "encoder-down": lambda steps, velocity: print(f"Layer 1 Encoder Down x{steps}")
         },
     2: {
-        "encoder-up": lambda: print("Layer 2 Encoder Up"),
-        "encoder-down": lambda: print("Layer 2 Encoder Down")
+        "encoder-up": lambda steps, velocity: print(f"Layer 2 Encoder Up x{steps}"),
+        "encoder-down": lambda steps, velocity: print(f"Layer 2 Encoder Down x{steps}")
         },
     3: {
-        "encoder-up": lambda: print("Layer 3 Encoder Up"),
-        "encoder-down": lambda: print("Layer 3 Encoder Down")
+        "encoder": ("MIDI_CC", 1, 0, 127, 2)  # Modulation wheel, 2 per detent
         },
 }
 
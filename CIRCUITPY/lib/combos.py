@@ -0,0 +1,107 @@
+'''
+Key Combos (/lib/combos.py)
+Written in Adafruit Circuit Python
+==========
+Sends a combo's macro, instead of the keys' own macros, when its keys
+are pressed together. Combos are set per layer in config.combos as
+    {layer: {(key, key, ...): macro, ...}, ...}
+and compiled by config_compiler.compile_combos into one lookup table per
+layer, keyed by the bitmask of the combo's keys. Every part of a combo
+is in the table too, so each key press is matched with one dictionary
+lookup on the bitmask of the keys held back so far, however many combos
+there are.
+
+A press of a key that is in one of the layer's combos is held back for
+up to window seconds, waiting for the rest of a combo:
+    - the held-back keys make a combo, and no bigger combo could still
+      follow: the combo macro is sent at once
+    - they can't be part of any combo: they are passed on, in order
+    - the window runs out, or one of them is released: the combo they
+      make is sent, or else they are passed on
+Keys in no combo are passed on at once, after any keys still held back.
+The releases of keys used in a combo are swallowed.
+'''
+
+class ComboEngine:
+    '''
+    Matches key presses against a layer's combos
+    Parameters:
+        key_press: function(key, time), passes on a key press
+        key_release: function(key, time), passes on a key release
+        combo: function(action, mask, time), sends a combo's action
+        window: float, most seconds between the first and last key of a combo
+    '''
+    def __init__(self, key_press, key_release, combo, window=0.05) -> None:
+        self.key_press = key_press
+        self.key_release = key_release
+        self.combo = combo
+        self.window = window
+        self._table = None
+        self._mask = 0  # Keys held back
+        self._order = []  # Keys held back, in press order
+        self._times = []
+        self._deadline = 0
+        self._used = 0  # Keys used in a sent combo and still down
+
+    def press(self, key, table, now) -> None:
+        '''
+        Handles a key press
+        Parameters:
+            key: integer, key number
+            table: dictionary, the current layer's table from compile_combos
+            now: float, time of the press
+        '''
+        bit = 1 << key
+        if self._mask:
+            entry = self._table.get(self._mask | bit)
+            if entry is None:  # Can't be part of a combo with the keys held back
+                self._decide(now)
+        if not self._mask:
+            entry = table.get(bit)
+            if entry is None:
+                self.key_press(key, now)
+                return
+            self._table = table
+            self._deadline = now + self.window
+        self._mask |= bit
+        self._order.append(key)
+        self._times.append(now)
+        if entry[0] is not None and not entry[1]:
+            self._decide(now)  # A complete combo that nothing else can follow
+
+    def release(self, key, now) -> None:
+        '''
+        Handles a key release
+        Parameters:
+            key: integer, key number
+            now: float, time of the release
+        '''
+        bit = 1 << key
+        if self._mask & bit:
+            self._decide(now)
+        if self._used & bit:
+            self._used &= ~bit
+        else:
+            self.key_release(key, now)
+
+    def update(self, now) -> None:
+        '''
+        Decides held-back keys once the window has run out; call every scan
+        Parameters:
+            now: float, time.monotonic() of the caller's tick
+        '''
+        if self._mask and now >= self._deadline:
+            self._decide(now)
+
+    def _decide(self, now):
+        mask = self._mask
+        action = self._table[mask][0]
+        self._mask = 0
+        if action is not None:
+            self._used |= mask
+            self.combo(action, mask, now)
+        else:
+            for key, at in zip(self._order, self._times):
+                self.key_press(key, at)
+        self._order.clear()
+        self._times.clear()
@@ -0,0 +1,313 @@
+'''
+Config Compiler (/lib/config_compiler.py)
+Written in Adafruit Circuit Python
+==========
+Turns the layers, combos and encoder_actions dictionaries from config.py into
+flat per-layer tables of ready-to-call actions, so the main loop finds
+a key's macro with one list index. Every macro is checked as it is
+compiled, so a typo in config.py stops the board at boot with a message
+naming the layer and key, rather than at the first keypress.
+'''
+
+import time
+
+from tap_hold import TapHold
+
+# After a pause, a turn may send this many seconds' worth of macro steps at once
+_BURST_TIME = 0.1
+
+def _layer_numbers(layers):
+    # Layers are cycled with (layer + 1) % len(layers), so they must be
+    # numbered 0 to len(layers) - 1.
+    numbers = sorted(layers)
+    if numbers != list(range(len(layers))):
+        raise ValueError(f"Layers must be numbered 0 to {len(layers) - 1}, got {numbers}")
+    return numbers
+
+def compile_layers(layers, macro_comm, num_keys=16, stepwise=False):
+    '''
+    Compiles config.layers into a table of key actions
+    Parameters:
+        layers: dictionary, {layer: {key number: macro, ...}, ...}; a key
+            can also have {"tap": macro, "hold": macro}, see tap_hold
+        macro_comm: MacroHandler, resolves and checks each macro
+        num_keys: integer, keys per layer
+        stepwise: boolean, compile with MacroHandler.compile_macro_steps,
+            for sending from a scheduler task
+    Returns:
+        list, one list of num_keys entries per layer; each entry is a
+        function taking no arguments, a TapHold of two of them, or None
+        for an unused key. With stepwise, the functions return a
+        generator that sends the macro a step at a time.
+    Raises:
+        ValueError: bad layer or key number, or a macro that can't be sent
+    '''
+    compile_macro = macro_comm.compile_macro_steps if stepwise else macro_comm.compile_macro
+    table = []
+    for layer in _layer_numbers(layers):
+        actions = [None] * num_keys
+        for key, macro in layers[layer].items():
+            if not 0 <= key < num_keys:
+                raise ValueError(f"Layer {layer}: no key {key}")
+            try:
+                if isinstance(macro, dict):
+                    actions[key] = _tap_hold(macro, compile_macro)
+                else:
+                    actions[key] = compile_macro(macro)
+            except ValueError as error:
+                raise ValueError(f"Layer {layer} key {key}: {error}")
+        table.append(actions)
+    return table
+
+def _tap_hold(macros, compile_macro):
+    for name in macros:
+        if name not in ("tap", "hold"):
+            raise ValueError(f"expected \"tap\" and \"hold\", got {name!r}")
+    if not macros:
+        raise ValueError("no \"tap\" or \"hold\" macro")
+    compiled = {}
+    for name, macro in macros.items():
+        try:
+            compiled[name] = compile_macro(macro)
+        except ValueError as error:
+            raise ValueError(f"{name}: {error}")
+    return TapHold(compiled.get("tap"), compiled.get("hold"))
+
+def compile_combos(combos, num_layers, macro_comm, num_keys=16, stepwise=False):
+    '''
+    Compiles config.combos into a lookup table per layer for combos.ComboEngine
+    Parameters:
+        combos: dictionary, {layer: {(key, key, ...): macro, ...}, ...}
+        num_layers: integer, number of layers in the layer table
+        macro_comm: MacroHandler, resolves and checks each macro
+        num_keys: integer, keys per layer
+        stepwise: boolean, as for compile_layers
+    Returns:
+        list, one dictionary per layer, {mask: (action, grows), ...} with
+        an entry for every combo and every part of one, keyed by the
+        bitmask of its keys; action is the combo's function, or None for
+        a part that isn't a combo itself, and grows is True if a bigger
+        combo contains it
+    Raises:
+        ValueError: a layer or key that doesn't exist, a combo of fewer
+            than two keys or a repeated one, or a macro that can't be sent
+    '''
+    compile_macro = macro_comm.compile_macro_steps if stepwise else macro_comm.compile_macro
+    for layer in combos:
+        if not 0 <= layer < num_layers:
+            raise ValueError(f"Combos for missing layer {layer}")
+    table = []
+    for layer in range(num_layers):
+        actions = {}
+        for keys, macro in combos.get(layer, {}).items():
+            mask = 0
+            for key in keys:
+                if not 0 <= key < num_keys:
+                    raise ValueError(f"Layer {layer} combo {keys}: no key {key}")
+                mask |= 1 << key
+            if len(keys) < 2 or bin(mask).count("1") != len(keys):
+                raise ValueError(f"Layer {layer} combo {keys}: needs two or more different keys")
+            if mask in actions:
+                raise ValueError(f"Layer {layer} combo {keys}: set twice")
+            try:
+                actions[mask] = compile_macro(macro)
+            except ValueError as error:
+                raise ValueError(f"Layer {layer} combo {keys}: {error}")
+        lookup = {}
+        for mask, action in actions.items():
+            # Every part of the combo, down to its single keys
+            part = mask
+            while part:
+                if part != mask:
+                    lookup[part] = (actions.get(part), True)
+                part = (part - 1) & mask
+        for mask, action in actions.items():
+            if mask not in lookup:
+                lookup[mask] = (action, False)
+        table.append(lookup)
+    return table
+
+def accelerate(delta, velocity, curve):
+    '''
+    Scales a turn of the encoder by an acceleration curve
+    Parameters:
+        delta: integer, signed detents
+        velocity: float, detents per second
+        curve: tuple, ((velocity, multiplier), ...) in rising order of
+            velocity, or None for no acceleration
+    Returns:
+        integer, signed steps
+    '''
+    multiplier = 1
+    if curve:
+        for threshold, factor in curve:
+            if velocity < threshold:
+                break
+            multiplier = factor
+    return int(delta * multiplier)
+
+def _direction_action(action, macro_comm):
+    # Macros are sent once per step, paced by the encoder's _StepPacer;
+    # functions take any number of steps at once. Returns the function
+    # and whether it is paced.
+    if isinstance(action, (tuple, list)):
+        send = macro_comm.compile_macro(action)
+        def repeat(steps, velocity):
+            for _ in range(steps):
+                send()
+        return repeat, True
+    if not callable(action):
+        raise ValueError("encoder actions must be macros or functions")
+    return action, False
+
+class _StepPacer:
+    # Keeps macro steps under max_rate per second. Steps past the limit
+    # are owed and sent by later calls, including the calls for 0 steps
+    # between turns. One pacer is shared by every layer's handler, as
+    # there is one encoder and one host.
+    def __init__(self, max_rate):
+        self.rate = max_rate
+        self.burst = max(1, max_rate * _BURST_TIME)
+        self.credit = self.burst
+        self.last = None
+        self.owed = 0
+        self.layer = None
+
+    def switch(self, layer):
+        # Steps owed on another layer are dropped, not sent later
+        if layer != self.layer:
+            self.owed = 0
+            self.layer = layer
+
+    def take(self, steps):
+        # Returns how many of steps may be sent now
+        now = time.monotonic()
+        if self.last is not None:
+            self.credit = min(self.burst, self.credit + (now - self.last) * self.rate)
+        self.last = now
+        sent = min(steps, int(self.credit))
+        self.credit -= sent
+        return sent
+
+def _split_turn(up, down, pacer):
+    # A turn the other way drops the steps still owed, so turning back
+    # after a fast spin goes back at once
+    up, up_paced = up
+    down, down_paced = down
+    def turn(steps, velocity):
+        owed = pacer.owed
+        if steps and (steps > 0) != (owed > 0):
+            owed = 0
+        steps += owed
+        sent = steps
+        if steps > 0:
+            if up_paced:
+                sent = pacer.take(steps)
+            if sent:
+                up(sent, velocity)
+        elif steps < 0:
+            if down_paced:
+                sent = -pacer.take(-steps)
+            if sent:
+                down(-sent, velocity)
+        pacer.owed = steps - sent
+    return turn
+
+def _accelerated(turn, curve, layer, pacer, idle=True):
+    # idle: pass on the calls for 0 detents as well
+    def accelerated_turn(delta, velocity):
+        pacer.switch(layer)
+        if delta or idle:
+            turn(accelerate(delta, velocity, curve), velocity)
+    return accelerated_turn
+
+def compile_encoder_actions(encoder_actions, num_layers, macro_comm, default_up, default_down,
+                            acceleration=None, max_rate=50, encoder_types=None):
+    '''
+    Compiles config.encoder_actions into one turn handler per layer
+    Parameters:
+        encoder_actions: dictionary, {layer: {"encoder-up": action, ...}, ...}
+            where each layer has either
+                "encoder": function(delta, velocity), for signed steps, or
+                "encoder": ("TYPE", arguments, ...), one of encoder_types, or
+                "encoder-up" and/or "encoder-down": function(steps, velocity)
+                    taking a positive step count, or a macro sent once per step
+        num_layers: integer, number of layers in the layer table
+        macro_comm: MacroHandler, compiles macro actions
+        default_up: macro or function, used where a layer has no "encoder-up"
+        default_down: macro or function, used where a layer has no "encoder-down"
+        acceleration: tuple, optional, curve for accelerate()
+        max_rate: integer, most times per second a macro action is sent,
+            so a fast spin can't flood the host with reports; the rest of
+            the steps are sent by the following calls, unless the encoder
+            turns back or another layer's handler is called first
+        encoder_types: dictionary, optional, {"TYPE": factory, ...}; each
+            factory is called with the arguments and returns a
+            function(delta, velocity)
+    Returns:
+        list, one function(delta, velocity) per layer, taking the signed
+        detents of a turn and its speed in detents per second. Call it
+        with 0 detents, for the current layer, on encoder ticks without a
+        turn, so steps held back by max_rate are sent; "encoder" functions
+        aren't called for those
+    Raises:
+        ValueError: an action for a layer that doesn't exist, or one that
+            is neither a function nor a macro that can be sent
+    '''
+    for layer in encoder_actions:
+        if not 0 <= layer < num_layers:
+            raise ValueError(f"Encoder actions for missing layer {layer}")
+    pacer = _StepPacer(max_rate)
+    table = []
+    for layer in range(num_layers):
+        actions = encoder_actions.get(layer, {})
+        try:
+            if "encoder" in actions:
+                turn = actions["encoder"]
+                if isinstance(turn, tuple) and encoder_types and turn[0] in encoder_types:
+                    try:
+                        turn = encoder_types[turn[0]](*turn[1:])
+                    except TypeError:
+                        raise ValueError(f"wrong number of arguments for {turn[0]}")
+                elif not callable(turn):
+                    raise ValueError("\"encoder\" must be a function or one of " + repr(sorted(encoder_types or ())))
+            else:
+                up = _direction_action(actions.get("encoder-up", default_up), macro_comm)
+                down = _direction_action(actions.get("encoder-down", default_down), macro_comm)
+                turn = _split_turn(up, down, pacer)
+        except ValueError as error:
+            raise ValueError(f"Layer {layer} encoder: {error}")
+        table.append(_accelerated(turn, acceleration, layer, pacer, idle="encoder" not in actions))
+    return table
+
+def _layer_change(action, num_layers):
+    if action == "next":
+        return lambda layer: (layer + 1) % num_layers
+    if action == "previous":
+        return lambda layer: (layer - 1) % num_layers
+    if isinstance(action, int) and 0 <= action < num_layers:
+        return lambda layer: action
+    raise ValueError(f"expected \"next\", \"previous\" or a layer number, got {action!r}")
+
+def compile_button_actions(button_actions, num_layers):
+    '''
+    Compiles config.ENCODER_BUTTON_ACTIONS into layer changes
+    Parameters:
+        button_actions: dictionary, {"click"/"double"/"hold": action, ...}
+            where action is "next", "previous" or a layer number
+        num_layers: integer, number of layers in the layer table
+    Returns:
+        dictionary, {gesture name: function(layer) returning the new layer};
+        gestures left out of button_actions are left out here too
+    Raises:
+        ValueError: an unknown gesture, or an action that isn't one of the above
+    '''
+    table = {}
+    for gesture, action in button_actions.items():
+        if gesture not in ("click", "double", "hold"):
+            raise ValueError(f"Unknown encoder button gesture {gesture!r}")
+        try:
+            table[gesture] = _layer_change(action, num_layers)
+        except ValueError as error:
+            raise ValueError(f"Encoder button {gesture}: {error}")
+    return table
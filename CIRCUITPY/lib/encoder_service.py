@@ -0,0 +1,244 @@
+'''
+Encoder Service (/lib/encoder_service.py)
+Written in Adafruit Circuit Python for
+HARDWARE: Adafruit I2C QT Rotary Encoder (seesaw, product 4991)
+==========
+Reads the rotary encoder and its push switch only when needed, and hands
+the main loop events instead of raw register values.
+
+With the seesaw INT output wired to a pin, the chip is only read after it
+has signalled a change. Without it, the chip is polled at most once every
+poll_interval seconds. Either way turns are read from the encoder's delta
+register, which the seesaw resets as it is read, so steps taken between
+reads are added up rather than lost or counted twice. Turns that have not
+been collected yet are merged into a single event.
+
+The seesaw needs read_delay seconds between having a register selected
+and having it read. The driver sleeps through that wait, which would hold
+up the whole main loop, so each read is split over two updates instead:
+one selects the register and a later one reads it. Turns and the switch
+are in different seesaw modules, so they take a read each. With INT
+wired, the switch is only read when the interrupt flags say it moved;
+without it, each poll reads both. Anything else written to the seesaw,
+such as its NeoPixel, selects another register, so call restart_read()
+after it.
+
+The push switch is debounced like a pmk Key, and its presses are turned
+into gestures: a click, a double click, or a hold. Each gesture is one
+event, however long the button is held down.
+
+Events are (kind, value, time) tuples:
+    (TURN, detents, time): signed detents, positive clockwise
+    (BUTTON, pressed, time): True when the switch went down
+    (CLICK, None, time): short press, on release
+    (DOUBLE, None, time): second short press within double_time of a
+        click, on release, in place of a second CLICK
+    (HOLD, None, time): switch held down for hold_time; no CLICK follows
+The speed of the latest turn, in detents per second, is kept in velocity.
+'''
+
+import time
+
+TURN = 0
+BUTTON = 1
+CLICK = 2
+DOUBLE = 3
+HOLD = 4
+
+# seesaw module bases and registers
+_GPIO_BASE = 0x01
+_GPIO_BULK = 0x04
+_GPIO_INTFLAG = 0x0A
+_ENCODER_BASE = 0x11
+_ENCODER_DELTA = 0x40
+
+# Registers read by update()
+_DELTA = (_ENCODER_BASE, _ENCODER_DELTA)
+_BUTTON = (_GPIO_BASE, _GPIO_BULK)
+_FLAGS = (_GPIO_BASE, _GPIO_INTFLAG)
+
+# Turns further apart than this are timed as if they were this far apart,
+# so the first detent after a pause reads as slow rather than near zero
+VELOCITY_WINDOW = 0.25
+
+class EncoderService:
+    '''
+    Interrupt-driven or rate-limited reader for a seesaw rotary encoder
+    Parameters:
+        seesaw: adafruit_seesaw.seesaw.Seesaw, the encoder board
+        button_pin: integer, seesaw pin of the push switch
+        int_pin: microcontroller.Pin, optional, pin wired to the seesaw INT
+            output; polls instead when None
+        poll_interval: float, shortest time in seconds between polls
+        read_delay: float, seconds the seesaw needs between selecting a
+            register and reading it; 8 ms, as in the driver, by default
+        debounce: float, seconds after a switch edge during which further
+            edges are ignored
+        hold_time: float, seconds the switch is held down for a HOLD
+        double_time: float, most seconds from a click to the release of
+            the next press for a DOUBLE
+    '''
+    def __init__(self, seesaw, button_pin=24, int_pin=None, poll_interval=0.01, read_delay=0.008,
+                 debounce=0.02, hold_time=0.6, double_time=0.3) -> None:
+        self.seesaw = seesaw
+        self.poll_interval = poll_interval
+        self.read_delay = read_delay
+        self.debounce = debounce
+        self.hold_time = hold_time
+        self.double_time = double_time
+        self.events = []
+        self.max_events = 16
+        self.position = 0
+        self.velocity = 0.0
+        self._last_turn = None
+        self._button_mask = 1 << button_pin
+        # Byte and bit of the switch in the big-endian GPIO bulk register
+        self._button_byte = 3 - button_pin // 8
+        self._button_bit = 1 << (button_pin % 8)
+        self._buffer = bytearray(4)
+        self._next_poll = 0
+        self._last_edge = 0
+        self._held = False
+        self._last_click = None
+        self._recheck = False
+        self._reads = []  # Registers still to read
+        self._reading = None  # Register selected, waiting for read_delay
+        self._selected_at = 0
+
+        seesaw.pin_mode(button_pin, seesaw.INPUT_PULLUP)
+        # Start-up reads wait for the seesaw, as the driver does
+        self.pressed = self._button(self._read(_BUTTON))
+        self._read(_DELTA)  # Drop any turns from before start-up
+
+        self._int = None
+        if int_pin is not None:
+            import digitalio
+            self._int = digitalio.DigitalInOut(int_pin)
+            self._int.switch_to_input(pull=digitalio.Pull.UP)
+            seesaw.set_GPIO_interrupts(self._button_mask, True)
+            seesaw.enable_encoder_interrupt()
+
+    def update(self, now=None) -> None:
+        '''
+        Call once per pass of the main loop; reads the encoder if it has
+        signalled a change, or if a poll is due, one register at a time
+        Parameters:
+            now: float, optional, time.monotonic() of the caller's loop
+        '''
+        if now is None:
+            now = time.monotonic()
+        if self.pressed and not self._held and now - self._last_edge >= self.hold_time:
+            self._held = True
+            self._last_click = None
+            self._queue(HOLD, None, now)
+        if self._reading is not None:
+            if now - self._selected_at < self.read_delay:
+                return
+            register = self._reading
+            self._reading = None
+            with self.seesaw.i2c_device as i2c:
+                i2c.readinto(self._buffer)
+            self._handle(register, now)
+        elif not self._reads:
+            self._queue_reads(now)
+        if self._reads:
+            self._reading = self._reads.pop(0)
+            self._selected_at = now
+            self.seesaw.write(*self._reading)
+
+    def get_event(self):
+        '''
+        Returns the oldest unhandled encoder event
+        Returns:
+            tuple, (kind, value, time), or None when there are none
+        '''
+        if self.events:
+            return self.events.pop(0)
+        return None
+
+    def clear_events(self) -> None:
+        '''Drops all unhandled encoder events'''
+        self.events.clear()
+
+    def restart_read(self) -> None:
+        '''
+        Call after writing anything else to the seesaw, such as its
+        NeoPixel; a read waiting for read_delay selects its register again
+        '''
+        if self._reading is not None:
+            self._reads.insert(0, self._reading)
+            self._reading = None
+
+    def _queue_reads(self, now):
+        if self._int is not None:
+            # An edge ignored while debouncing needs one more look once the
+            # debounce time is up, as the switch may not interrupt again
+            if self._recheck and now - self._last_edge >= self.debounce:
+                self._recheck = False
+                self._reads.append(_BUTTON)
+            elif not self._int.value:  # INT is pulled low while a change is pending
+                # Reading the flags clears them; the switch is only read if it moved
+                self._reads.extend((_FLAGS, _DELTA))
+        elif now >= self._next_poll:
+            self._next_poll = now + self.poll_interval
+            self._reads.extend((_DELTA, _BUTTON))
+
+    def _handle(self, register, now):
+        buffer = self._buffer
+        if register == _FLAGS:
+            if buffer[self._button_byte] & self._button_bit:
+                self._reads.append(_BUTTON)
+        elif register == _DELTA:
+            delta = (buffer[0] << 24) | (buffer[1] << 16) | (buffer[2] << 8) | buffer[3]
+            if delta & 0x80000000:
+                delta -= 0x100000000
+            if delta:
+                self.position += delta
+                elapsed = VELOCITY_WINDOW if self._last_turn is None else min(now - self._last_turn, VELOCITY_WINDOW)
+                self.velocity = abs(delta) / max(elapsed, self.poll_interval)
+                self._last_turn = now
+                self._queue_turn(delta, now)
+        else:
+            pressed = self._button(buffer)
+            if pressed != self.pressed:
+                if now - self._last_edge >= self.debounce:
+                    self._button_edge(pressed, now)
+                else:
+                    self._recheck = True
+
+    def _button_edge(self, pressed, now):
+        self.pressed = pressed
+        self._last_edge = now
+        self._queue(BUTTON, pressed, now)
+        if pressed:
+            self._held = False
+        elif not self._held:
+            if self._last_click is not None and now - self._last_click <= self.double_time:
+                self._last_click = None
+                self._queue(DOUBLE, None, now)
+            else:
+                self._last_click = now
+                self._queue(CLICK, None, now)
+
+    def _queue_turn(self, delta, now):
+        # Add to a turn that hasn't been collected yet, so a fast spin
+        # arrives as one event carrying every detent
+        if self.events and self.events[-1][0] == TURN:
+            delta += self.events.pop()[1]
+            if not delta:
+                return
+        self._queue(TURN, delta, now)
+
+    def _queue(self, kind, value, now):
+        if len(self.events) >= self.max_events:
+            self.events.pop(0)
+        self.events.append((kind, value, now))
+
+    def _read(self, register):
+        base, address = register
+        self.seesaw.read(base, address, self._buffer, delay=self.read_delay)
+        return self._buffer
+
+    def _button(self, buffer):
+        # The switch pulls its pin low while pressed
+        return not buffer[self._button_byte] & self._button_bit
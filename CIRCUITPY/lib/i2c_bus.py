@@ -0,0 +1,222 @@
+'''
+I2C Bus Manager (/lib/i2c_bus.py)
+Written in Adafruit Circuit Python
+==========
+Owns the shared busio.I2C and stands in for it, so every driver is
+created with the manager in place of the bus. It keeps the bus locked
+for itself, and drivers' try_lock() always succeeds.
+
+Devices are given a priority with configure():
+    INPUT: switches and the encoder; every transaction goes out at once
+    LEDS, DISPLAY: writes are queued and sent by service(), LEDs first,
+        at most slice_bytes per call, so a large OLED push never holds
+        up a switch or encoder read for more than one slice
+
+A read from a device first sends any writes still queued for it, so
+each device sees its transactions in the order the driver made them.
+Queued writes to the same device are merged and split by a write rule
+that knows the device's framing:
+    RAW_WRITES: left as they are
+    REGISTER_WRITES: [register, data...] with an auto-incrementing
+        register pointer, e.g. IS31FL3731
+    SSD1306_WRITES: [control byte, ...] command and data streams
+Per-device counters of transactions, bytes and bus time are kept in stats.
+'''
+
+import time
+
+INPUT = 0
+LEDS = 1
+DISPLAY = 2
+
+class RawWrites:
+    '''Write rule for devices whose writes can't be merged or split'''
+    def merge(self, queued, data):
+        '''Returns queued and data as one write, or None if they can't be'''
+        return None
+
+    def split(self, data, size):
+        '''Returns data as (first size bytes, rest), or None if it can't be split'''
+        return None
+
+class RegisterWrites(RawWrites):
+    '''Writes of [register, data...] to an auto-incrementing register pointer'''
+    def merge(self, queued, data):
+        if data[0] == queued[0] + len(queued) - 1:
+            return queued + data[1:]
+        return None
+
+    def split(self, data, size):
+        if size < 2:
+            return None
+        return data[:size], bytes((data[0] + size - 1,)) + data[size:]
+
+class SSD1306Writes(RawWrites):
+    '''Writes that start with an SSD1306 control byte'''
+    COMMANDS = 0x00  # Co = 0: the rest of the write is commands
+    COMMAND = 0x80   # Co = 1: one command, then another control byte
+    DATA = 0x40      # Co = 0, D/C# = 1: the rest of the write is display data
+
+    def merge(self, queued, data):
+        if data[0] == queued[0] == self.DATA:
+            return queued + data[1:]
+        # Single commands and command streams become one command stream
+        queued_commands, commands = self._commands(queued), self._commands(data)
+        if queued_commands is None or commands is None:
+            return None
+        return bytes((self.COMMANDS,)) + queued_commands + commands
+
+    def _commands(self, data):
+        if data[0] == self.COMMANDS or (data[0] == self.COMMAND and len(data) == 2):
+            return data[1:]
+        return None
+
+    def split(self, data, size):
+        # Display data carries on from where the last write left off
+        if data[0] != self.DATA or size < 2:
+            return None
+        return data[:size], data[:1] + data[size:]
+
+RAW_WRITES = RawWrites()
+REGISTER_WRITES = RegisterWrites()
+SSD1306_WRITES = SSD1306Writes()
+
+class BusManager:
+    '''
+    Prioritising, batching owner of an I2C bus, with the busio.I2C interface
+    Parameters:
+        i2c: busio.I2C, the bus; it is locked for good
+        slice_bytes: integer, most queued bytes sent per service() call
+    '''
+    def __init__(self, i2c, slice_bytes=64) -> None:
+        while not i2c.try_lock():
+            pass
+        self.i2c = i2c
+        self.slice_bytes = slice_bytes
+        self.stats = {}  # {address: [transactions, bytes, nanoseconds]}
+        self._devices = {}  # {address: (priority, write rule)}
+        self._queues = {LEDS: [], DISPLAY: []}  # [[address, bytes], ...], oldest first
+
+    def configure(self, address, priority, writes=RAW_WRITES) -> None:
+        '''
+        Sets how a device's transactions are handled; unconfigured
+        devices are treated as INPUT
+        Parameters:
+            address: integer, 7-bit I2C address
+            priority: INPUT, LEDS or DISPLAY
+            writes: write rule for merging and splitting queued writes
+        '''
+        self._devices[address] = (priority, writes)
+
+    # busio.I2C interface
+
+    def try_lock(self) -> bool:
+        return True
+
+    def unlock(self) -> None:
+        pass
+
+    def scan(self) -> list:
+        return self.i2c.scan()
+
+    def writeto(self, address, buffer, *, start=0, end=None) -> None:
+        if end is None:
+            end = len(buffer)
+        priority, writes = self._devices.get(address, (INPUT, RAW_WRITES))
+        # Empty writes are probes that must fail at once if nothing answers
+        if priority == INPUT or start == end:
+            self._flush_address(address)
+            self._transfer(address, end - start, self.i2c.writeto, address, buffer, start=start, end=end)
+            return
+        data = bytes(buffer[start:end])
+        queue = self._queues[priority]
+        if queue and queue[-1][0] == address:
+            merged = writes.merge(queue[-1][1], data)
+            if merged is not None:
+                queue[-1][1] = merged
+                return
+        queue.append([address, data])
+
+    def readfrom_into(self, address, buffer, *, start=0, end=None) -> None:
+        self._flush_address(address)
+        count = (len(buffer) if end is None else end) - start
+        self._transfer(address, count, self.i2c.readfrom_into, address, buffer, start=start, end=end)
+
+    def writeto_then_readfrom(self, address, buffer_out, buffer_in, *,
+                              out_start=0, out_end=None, in_start=0, in_end=None) -> None:
+        self._flush_address(address)
+        count = ((len(buffer_out) if out_end is None else out_end) - out_start
+                 + (len(buffer_in) if in_end is None else in_end) - in_start)
+        self._transfer(address, count, self.i2c.writeto_then_readfrom, address, buffer_out, buffer_in,
+                       out_start=out_start, out_end=out_end, in_start=in_start, in_end=in_end)
+
+    def deinit(self) -> None:
+        self.flush()
+        self.i2c.unlock()
+        self.i2c.deinit()
+
+    # Queued writes
+
+    def service(self, now=None) -> None:
+        '''
+        Sends queued writes, LEDs before the display, up to slice_bytes;
+        call once per tick
+        Parameters:
+            now: float, optional, unused; lets service() run as a scheduler task
+        '''
+        budget = self.slice_bytes
+        for priority in (LEDS, DISPLAY):
+            queue = self._queues[priority]
+            while queue and budget > 0:
+                address, data = queue[0]
+                if len(data) > budget:
+                    # Send what fits of a write that can be split, and leave the rest queued
+                    pieces = self._devices[address][1].split(data, budget)
+                    if pieces is not None:
+                        self._write(address, pieces[0])
+                        queue[0][1] = pieces[1]
+                        return
+                    if budget < self.slice_bytes:
+                        return  # Leave an unsplittable write for a fresh slice
+                queue.pop(0)
+                self._write(address, data)
+                budget -= len(data)
+
+    def flush(self) -> None:
+        '''Sends every queued write now'''
+        for priority in (LEDS, DISPLAY):
+            queue = self._queues[priority]
+            while queue:
+                address, data = queue.pop(0)
+                self._write(address, data)
+
+    def queued_bytes(self) -> int:
+        '''Bytes waiting to be sent'''
+        return sum(len(data) for queue in self._queues.values() for _, data in queue)
+
+    def _flush_address(self, address):
+        priority = self._devices.get(address, (INPUT,))[0]
+        if priority == INPUT:
+            return
+        queue = self._queues[priority]
+        index = 0
+        while index < len(queue):
+            if queue[index][0] == address:
+                self._write(address, queue.pop(index)[1])
+            else:
+                index += 1
+
+    def _write(self, address, data):
+        self._transfer(address, len(data), self.i2c.writeto, address, data)
+
+    def _transfer(self, address, count, operation, *args, **kwargs):
+        start = time.monotonic_ns()
+        try:
+            operation(*args, **kwargs)
+        finally:
+            stats = self.stats.get(address)
+            if stats is None:
+                stats = self.stats[address] = [0, 0, 0]
+            stats[0] += 1
+            stats[1] += count
+            stats[2] += time.monotonic_ns() - start
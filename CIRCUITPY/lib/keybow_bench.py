@@ -0,0 +1,104 @@
+'''
+Keybow Benchmarks (/lib/keybow_bench.py)
+Written in Adafruit Circuit Python
+==========
+Timing helpers for the scan loop and macro output, using
+time.monotonic_ns(). They run on the device, from the REPL:
+
+    import keybow_bench
+    keybow_bench.run()
+
+and on the host, where sim/bench.py adds key-to-report latency and I2C
+bus measurements from the simulator. Macro timings capture the keyboard
+reports instead of sending them, so nothing is typed into the host.
+'''
+
+import time
+from macro_handler import ReportRecorder
+
+def percentile(values, fraction):
+    '''
+    Returns the value below which the given fraction of values fall
+    Parameters:
+        values: list, numbers
+        fraction: float, 0.5 for the median, 0.99 for p99
+    '''
+    if not values:
+        return 0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+def time_scans(keybow, iterations=500):
+    '''
+    Times keybow.update()
+    Parameters:
+        keybow: pmk.PMK, the keypad to scan
+        iterations: integer, number of scans to time
+    Returns:
+        list, nanoseconds taken by each scan
+    '''
+    times = []
+    for _ in range(iterations):
+        start = time.monotonic_ns()
+        keybow.update()
+        times.append(time.monotonic_ns() - start)
+    return times
+
+def time_macro(macro_comm, macro, iterations=20, compiled=True):
+    '''
+    Times sending a keyboard macro, with the reports captured
+    Parameters:
+        macro_comm: MacroHandler with a ReportRecorder as its
+            keyboard_device, so nothing is typed into the host
+        macro: tuple, ("PARSER_ID", PARSER_MACRO), a keyboard macro
+        iterations: integer, number of sends to time
+        compiled: boolean, False to time send_macro() instead of the
+            function from compile_macro()
+    Returns:
+        tuple, (reports per send, nanoseconds per send)
+    '''
+    if compiled:
+        send = macro_comm.compile_macro(macro)
+    else:
+        send = lambda: macro_comm.send_macro(macro)
+    recorder = macro_comm.keyboard_device
+    recorder.reports.clear()
+    start = time.monotonic_ns()
+    for _ in range(iterations):
+        send()
+    elapsed = time.monotonic_ns() - start
+    return len(recorder.reports) // iterations, elapsed // iterations
+
+def macro_label(macro):
+    '''Short printable name for a macro'''
+    return " ".join(str(part) for part in macro)
+
+def run(macros=None, scans=500):
+    '''
+    Prints scan and macro timings for this board
+    Parameters:
+        macros: list, optional, keyboard macros to time; defaults to the
+            TEXT and UTF16 macros in config.layers
+        scans: integer, number of scans to time
+    '''
+    from pmk import PMK
+    from pmk.platform.keybow2040 import Keybow2040
+    from macro_handler import MacroHandler
+
+    keybow = PMK(Keybow2040())
+    times = time_scans(keybow, scans)
+    print("scan p50 %d us, p99 %d us" % (percentile(times, 0.5) // 1000, percentile(times, 0.99) // 1000))
+
+    if macros is None:
+        from config import layers
+        macros = [macro for layer in layers.values() for entry in layer.values()
+                  for macro in (entry.values() if isinstance(entry, dict) else (entry,))  # Tap/hold keys
+                  if macro[0] in ("TEXT", "UTF16", "MOD+")]
+    macro_comm = MacroHandler(keyboard_device=ReportRecorder())
+    for macro in macros:
+        reports, compiled_ns = time_macro(macro_comm, macro)
+        _, direct_ns = time_macro(macro_comm, macro, compiled=False)
+        print("%s: %d reports, %d reports/s compiled, %d reports/s send_macro" % (
+            macro_label(macro), reports,
+            reports * 1000000000 // max(compiled_ns, 1),
+            reports * 1000000000 // max(direct_ns, 1)))
@@ -0,0 +1,160 @@
+'''
+Layer Display (/lib/layer_display.py)
+Written in Adafruit Circuit Python for
+HARDWARE: 128x64 SSD1306 OLED
+==========
+Shows the active layer on the OLED: a large bitmapped numeral when the
+layer changes, followed by the grid of key labels. The change-over is
+driven by update() from the main loop, so nothing here ever sleeps and
+key scanning carries on while the numeral is on screen.
+
+Each screen is drawn once and kept as a copy of the display's buffer, so
+showing it again is a single buffer copy and one show(). The cache holds
+at most cache_size screens, dropping the least recently used.
+'''
+
+import time
+
+# Size of each block in the large numeral, and where the numeral is drawn
+NUMERAL_PIXEL_SIZE = 8
+NUMERAL_X_OFFSET = 48  # Adjust to center the number horizontally
+NUMERAL_Y_OFFSET = 16  # Adjust to center vertically
+
+class LayerDisplay:
+    '''
+    Timed layer display state machine for an SSD1306 display
+    Parameters:
+        oled: adafruit_ssd1306.SSD1306_I2C, the display to draw on
+        labels_map: dictionary, {layer: {key number: "label", ...}, ...}
+        numbers_bitmap: dictionary, {"digit": ["101", ...], ...}
+        numeral_time: float, seconds to show the numeral before the labels
+        cache_size: integer, most rendered screens to keep (two per layer)
+    '''
+    NUMERAL = 0
+    LABELS = 1
+
+    def __init__(self, oled, labels_map, numbers_bitmap, numeral_time=1.0, cache_size=8) -> None:
+        self.oled = oled
+        self.labels_map = labels_map
+        self.numbers_bitmap = numbers_bitmap
+        self.numeral_time = numeral_time
+        self.cache_size = cache_size
+        self.layer = None
+        self.active = True
+        self._labels_due = None
+        self._cache = {}
+        self._cache_order = []
+
+    def show_layer(self, layer, now=None) -> None:
+        '''
+        Draws the large numeral for a layer and schedules the key labels
+        to replace it once numeral_time has passed
+        Parameters:
+            layer: integer, the layer to show
+            now: float, optional, time.monotonic() of the caller's loop
+        '''
+        if now is None:
+            now = time.monotonic()
+        self.layer = layer
+        self.active = True
+        self._blit(self.NUMERAL, layer)
+        self.oled.show()
+        self._labels_due = now + self.numeral_time
+
+    def update(self, now=None) -> None:
+        '''
+        Call once per pass of the main loop; draws the key labels when
+        the numeral has been up for long enough
+        Parameter:
+            now: float, optional, time.monotonic() of the caller's loop
+        '''
+        if self._labels_due is None:
+            return
+        if now is None:
+            now = time.monotonic()
+        if now >= self._labels_due:
+            self._labels_due = None
+            self._blit(self.LABELS, self.layer)
+            self.oled.show()
+
+    def sleep(self) -> None:
+        '''
+        Blanks the display, cancelling any pending label update
+        '''
+        self._labels_due = None
+        self.oled.fill(0)
+        self.oled.show()
+        self.active = False
+
+    def wake(self, now=None) -> None:
+        '''
+        Redraws the current layer if the display was asleep
+        Parameter:
+            now: float, optional, time.monotonic() of the caller's loop
+        '''
+        if not self.active and self.layer is not None:
+            self.show_layer(self.layer, now)
+
+    def prerender(self, layers) -> None:
+        '''
+        Renders both screens for each layer into the cache up front, so
+        that even the first switch to a layer is a plain buffer copy
+        Parameter:
+            layers: iterable, layer numbers to render
+        '''
+        for layer in layers:
+            self._blit(self.NUMERAL, layer)
+            self._blit(self.LABELS, layer)
+        if self.active and self.layer is not None:
+            self._blit(self.LABELS if self._labels_due is None else self.NUMERAL, self.layer)
+        else:
+            self.oled.fill(0)
+
+    def clear_cache(self) -> None:
+        '''
+        Drops all rendered screens, e.g. after editing labels_map
+        '''
+        self._cache.clear()
+        del self._cache_order[:]
+
+    def _blit(self, screen, layer) -> None:
+        # Copies a cached screen into the display buffer, rendering and
+        # caching it first if needed.
+        key = (screen, layer)
+        cached = self._cache.get(key)
+        if cached is not None:
+            self._cache_order.remove(key)
+            self._cache_order.append(key)
+            self.oled.buffer[:] = cached
+            return
+        if screen == self.NUMERAL:
+            self._draw_numeral(layer)
+        else:
+            self._draw_labels(layer)
+        if self.cache_size <= 0:
+            return
+        if len(self._cache_order) >= self.cache_size:
+            self._cache.pop(self._cache_order.pop(0))
+        self._cache[key] = bytes(self.oled.buffer)
+        self._cache_order.append(key)
+
+    def _draw_numeral(self, layer) -> None:
+        self.oled.fill(0)
+        bitmap = self.numbers_bitmap.get(str(layer))
+        if bitmap is None:
+            return
+        for row, line in enumerate(bitmap):
+            for col, pixel in enumerate(line):
+                if pixel == "1":
+                    x = NUMERAL_X_OFFSET + col * NUMERAL_PIXEL_SIZE
+                    y = NUMERAL_Y_OFFSET + row * NUMERAL_PIXEL_SIZE
+                    self.oled.fill_rect(x, y, NUMERAL_PIXEL_SIZE, NUMERAL_PIXEL_SIZE, 1)
+
+    def _draw_labels(self, layer) -> None:
+        self.oled.fill(0)
+        layer_labels = self.labels_map.get(layer, {})
+        for col in range(4):
+            for row in range(4):
+                key_index = col * 4 + (3 - row)
+                label_text = layer_labels.get(key_index, "")
+                self.oled.text(label_text, col * 32, row * 16, 1)  # (for 128x64)
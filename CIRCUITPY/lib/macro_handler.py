@@ -12,11 +12,13 @@ macro handlers to simplfiy coding / macro writing, and an
 extensible framework for additional custom macro handlers
 '''
 
+import time
 import usb_hid
+from adafruit_hid import find_device
 from adafruit_hid.keyboard import Keyboard
 from adafruit_hid.keyboard_layout_us import KeyboardLayoutUS
 from adafruit_hid.consumer_control import ConsumerControl
-from adafruit_hid.Mouse import Mouse
+from adafruit_hid.mouse import Mouse
 
 class HIDPool( object ):
 	'''
@@ -32,8 +34,23 @@ class HIDPool( object ):
 	mouse = Mouse( usb_hid.devices )
 	text = KeyboardLayoutUS( key )
 	
+class ReportRecorder( object ):
+	'''
+	Keyboard HID device that keeps a copy of every report instead of
+	sending it; Keyboard( ReportRecorder() ) is a keyboard that types
+	nothing into the host
+	'''
+	usage_page = 0x01
+	usage = 0x06
+	
+	def __init__( self ) -> None:
+		self.reports = []
+	
+	def send_report( self, report, report_id = None ) -> None:
+		self.reports.append( bytes( report ) )
+	
 # Workaround for bad assumption in adafruit_hid.keyboard.Keyboard.send
-def parse_mod_plus( *macro_data ) -> None:
+def parse_mod_plus( *macro_data, keyboard = HIDPool.key ) -> None:
 	'''
 	Presses modifier keys, sends regular
 	keys individually, releases modifer keys
@@ -43,6 +60,8 @@ def parse_mod_plus( *macro_data ) -> None:
 		modifer: integer, key code, 1-5 modifiers, eg ALT
 		flag: string, "MOD_PLUS", exactly
 		regular: integer, key code, 1+ additional keys, eg F4
+		keyboard: adafruit_hid.keyboard.Keyboard, optional, the keyboard
+			to type on
 	'''
 	_held_flag = True
 	for _key_code in macro_data:
@@ -50,19 +69,19 @@ def parse_mod_plus( *macro_data ) -> None:
 			_held_flag = False
 			continue
 		if _held_flag:
-			HIDPool.key.press( _key_code )
+			keyboard.press( _key_code )
 		else:
-			HIDPool.key.press( _key_code )
-			HIDPool.key.release( _key_code )
+			keyboard.press( _key_code )
+			keyboard.release( _key_code )
 	for _key_code in reversed( macro_data ):
 		if "MOD+" == _key_code:
 			_held_flag = True
 			continue
 		if _held_flag:
-			HIDPool.key.release( _key_code )
+			keyboard.release( _key_code )
 
 # Workaround for bad assumption in adafruit_hid.keyboard_layout_us.KeyboardLayoutUS.write
-def parse_utf16( target_platform, utf16_code ) -> None:
+def parse_utf16( target_platform, utf16_code, keyboard = HIDPool.key ) -> None:
 	'''
 	Sends keystrokes to enter a UTF16 character on the target platform
 	"NIX": ChromeOS / Linux, "WIN":windows xp+, "MAC": MAcOS 8.5+
@@ -70,29 +89,31 @@ def parse_utf16( target_platform, utf16_code ) -> None:
 	Parameters:
 		target_platform: string, "NIX", "WIN", "MAC"
 		utf16_code: string, 4 hexadecimal digits
+		keyboard: adafruit_hid.keyboard.Keyboard, optional, the keyboard
+			to type on
 	See Also:
 		https://en.wikipedia.org/wiki/Unicode_input#Hexadecimal_input
 	'''
 	if "NIX" == target_platform:
-		HIDPool.key.press( 0xE4, 0xE5, 0x18 )
-		HIDPool.key.release( 0x18 )
+		keyboard.press( 0xE4, 0xE5, 0x18 )
+		keyboard.release( 0x18 )
 	elif "WIN" == target_platform:
-		HIDPool.key.press( 0xE6 )
-		HIDPool.key.press( 0x57 )
-		HIDPool.key.release( 0x57 )
+		keyboard.press( 0xE6 )
+		keyboard.press( 0x57 )
+		keyboard.release( 0x57 )
 	elif "MAC" == target_platform:
-		HIDPool.key.press( 0xE2 )
+		keyboard.press( 0xE2 )
 	for _hex_digit in utf16_code:
 		# Use last index returned for safety with capitlized hex
 		_hex_keycode = HIDPool.text.keycodes( _hex_digit )[-1]
-		HIDPool.key.press( _hex_keycode )
-		HIDPool.key.release( _hex_keycode )
+		keyboard.press( _hex_keycode )
+		keyboard.release( _hex_keycode )
 	if "MAC" == target_platform:
-		HIDPool.key.release( 0xE2 )
+		keyboard.release( 0xE2 )
 	elif "WIN" == target_platform:
-		HIDPool.key.release( 0xE6 )
+		keyboard.release( 0xE6 )
 	elif "NIX" == target_platform:
-		HIDPool.key.release( 0xE5, 0xE4 )
+		keyboard.release( 0xE5, 0xE4 )
 
 def parse_mouse_select( mouse_buttons, x_axis, y_axis, scroll ) -> None:
 	'''
@@ -121,13 +142,26 @@ class MacroHandler( HIDPool ):
 	MACRO_DATA = 1
 	# TODO: potentially move attributes here
 	
-	def __init__( self, parser_dictionary = _macro_parsers ) -> None:
+	def __init__( self, parser_dictionary = _macro_parsers, keyboard_device = None ) -> None:
 		'''
 		Adds dictionary of parser functions to the instance
 		Creates aliases to aggregate HID communications
 		Parameter:
 			parser_dictionary: dictionary, {"parser id": parser_function, ...}
+			keyboard_device: HID device, optional, takes keyboard reports in
+				place of the USB keyboard; any object with send_report(),
+				usage_page and usage, eg a ReportRecorder
 		'''
+		if keyboard_device is None:
+			keyboard_device = find_device( usb_hid.devices, usage_page = 0x01, usage = 0x06 )
+		else:
+			self.key = Keyboard( keyboard_device )
+			self.text = KeyboardLayoutUS( self.key )
+		self.keyboard_device = keyboard_device
+		# Precompiled keyboard macros are typed on a keyboard of their own
+		self.__recorder = ReportRecorder()
+		self.__recording_key = Keyboard( self.__recorder )
+		self.__recording_text = KeyboardLayoutUS( self.__recording_key )
 		self.__internal_parsers = {
 		"KEY": self.key.send,
 		"MEDIA": self.media.send,
@@ -137,6 +171,7 @@ class MacroHandler( HIDPool ):
 		}
 		
 		self.__external_parsers = parser_dictionary
+		self.__compilers = {}
 	
 	def send_macro( self, macro_container ) -> None:
 		'''
@@ -161,7 +196,156 @@ class MacroHandler( HIDPool ):
 			if _macro[ self.MACRO_TYPE ] in self.__internal_parsers:
 				self.__internal_parsers[ _macro[ self.MACRO_TYPE ] ]( *_macro[ self.MACRO_DATA: ] )
 			elif _macro[ self.MACRO_TYPE ] in self.__external_parsers:
-				self.__external_parsers[ _macro[ self.MACRO_TYPE ] ]( *_macro[ self.MACRO_DATA: ] )
+				self.__on_keyboard( self.__external_parsers[ _macro[ self.MACRO_TYPE ] ] )( *_macro[ self.MACRO_DATA: ] )
+	
+	def compile_macro( self, macro_container ):
+		'''
+		Resolves and checks a macro once, ahead of time, so that sending
+		it later is a single call with no parser lookups
+		macro_container Format: same as send_macro
+		Parameter:
+			macro_container: tuple or list, see send_macro
+		Returns:
+			function, takes no arguments, sends the macro when called
+		Raises:
+			ValueError: unknown parser id, or macro data the parser can't send
+		'''
+		_steps = tuple( ( _parser, _macro_data ) for _parser, _macro_data, _reports in self.__compile_steps( macro_container ) )
+		if 1 == len( _steps ):
+			_parser, _macro_data = _steps[0]
+			return lambda: _parser( *_macro_data )
+		def _send_steps():
+			for _parser, _macro_data in _steps:
+				_parser( *_macro_data )
+		return _send_steps
+	
+	def compile_macro_steps( self, macro_container ):
+		'''
+		Like compile_macro, but sends the macro a piece at a time, so a
+		scheduler can run other tasks while a long macro is typing
+		macro_container Format: same as send_macro
+		Parameter:
+			macro_container: tuple or list, see send_macro
+		Returns:
+			function, takes no arguments, returns a generator that sends
+			one keyboard report, or one call of any other parser, each
+			time it is advanced
+		Raises:
+			ValueError: unknown parser id, or macro data the parser can't send
+		'''
+		_steps = self.__compile_steps( macro_container )
+		def _step_through():
+			for _parser, _macro_data, _reports in _steps:
+				if _reports is not None:
+					_device = self.keyboard_device
+					for _report in _reports:
+						_device.send_report( _report )
+						yield
+				else:
+					_parser( *_macro_data )
+					yield
+		return _step_through
+	
+	def __compile_steps( self, macro_container ) -> tuple:
+		'''
+		Resolves and checks each macro in a container
+		Returns:
+			tuple, ( parser, macro_data, reports ) triples; keyboard-only
+			macros become ( send_reports, ( reports, ), reports ), and
+			reports is None for every other macro
+		'''
+		if tuple == type( macro_container ):
+			macro_container = [macro_container]
+		_steps = []
+		for _macro in macro_container:
+			_macro_type = _macro[ self.MACRO_TYPE ]
+			if _macro_type in self.__internal_parsers:
+				_parser = self.__internal_parsers[ _macro_type ]
+			elif _macro_type in self.__external_parsers:
+				_parser = self.__on_keyboard( self.__external_parsers[ _macro_type ] )
+			else:
+				raise ValueError( "Unknown macro type: " + repr( _macro_type ) )
+			_macro_data = tuple( _macro[ self.MACRO_DATA: ] )
+			self.__check_macro( _macro_type, _macro_data )
+			if _macro_type in self.__compilers:
+				_macro_data = tuple( self.__compilers[ _macro_type ]( *_macro_data ) )
+			# Keyboard-only macros are turned into their raw reports now
+			if self.__keyboard_only( _macro_type ):
+				_reports = self.record_reports( _macro_type, _macro_data )
+				_steps.append( ( self.send_reports, ( _reports, ), _reports ) )
+			else:
+				_steps.append( ( _parser, _macro_data, None ) )
+		return tuple( _steps )
+	
+	def record_reports( self, macro_type, macro_data ) -> tuple:
+		'''
+		Types a keyboard-only macro on a Keyboard over a ReportRecorder,
+		so nothing is sent to the host
+		Parameters:
+			macro_type: string, "TEXT", or the id of parse_mod_plus or
+				parse_utf16, eg "MOD+"
+			macro_data: tuple, arguments for the parser
+		Returns:
+			tuple, the 8-byte keyboard reports the parser would have sent
+		'''
+		self.__recording_key.release_all()
+		self.__recorder.reports = []
+		if "TEXT" == macro_type:
+			self.__recording_text.write( *macro_data )
+		else:
+			self.__external_parsers[ macro_type ]( *macro_data, keyboard = self.__recording_key )
+		return tuple( self.__recorder.reports )
+	
+	def send_reports( self, reports ) -> None:
+		'''
+		Sends recorded keyboard reports straight to the keyboard device
+		Parameter:
+			reports: tuple, reports from record_reports
+		'''
+		_device = self.keyboard_device
+		for _report in reports:
+			_device.send_report( _report )
+	
+	def __keyboard_only( self, macro_type ) -> bool:
+		'''
+		Returns True if a macro type only sends keyboard reports
+		'''
+		return "TEXT" == macro_type or self.__external_parsers.get( macro_type ) in ( parse_mod_plus, parse_utf16 )
+	
+	def __on_keyboard( self, parser ):
+		'''
+		Makes parse_mod_plus and parse_utf16 type on this handler's
+		keyboard, when it isn't the shared USB one
+		'''
+		if parser in ( parse_mod_plus, parse_utf16 ) and self.key is not HIDPool.key:
+			_keyboard = self.key
+			return lambda *macro_data: parser( *macro_data, keyboard = _keyboard )
+		return parser
+	
+	def __check_macro( self, macro_type, macro_data ) -> None:
+		'''
+		Raises ValueError if macro_data can't be sent by a builtin parser
+		Other parsers are not checked
+		'''
+		if macro_type in ( "KEY", "MOD+" ):
+			for _key_code in macro_data:
+				if "MOD+" == macro_type and "MOD+" == _key_code:
+					continue
+				if int != type( _key_code ) or not 0 < _key_code <= 0xFF:
+					raise ValueError( "Bad keycode: " + repr( _key_code ) )
+		elif "MEDIA" == macro_type:
+			if 1 != len( macro_data ) or int != type( macro_data[0] ):
+				raise ValueError( "Bad consumer control code: " + repr( macro_data ) )
+		elif "TEXT" == macro_type:
+			for _char in macro_data[0]:
+				# Raises ValueError for characters the layout can't type
+				self.text.keycodes( _char )
+		elif "UTF16" == macro_type:
+			if 2 != len( macro_data ) or macro_data[0] not in ( "NIX", "WIN", "MAC" ):
+				raise ValueError( "Bad UTF16 platform: " + repr( macro_data ) )
+			if 4 != len( macro_data[1] ):
+				raise ValueError( "UTF16 code must be 4 hex digits: " + repr( macro_data[1] ) )
+			int( macro_data[1], 16 )
 	
 	def get_handler_list( self ) -> list:
 		'''
@@ -170,7 +354,7 @@ class MacroHandler( HIDPool ):
 		'''
 		return sorted( self.__internal_parsers ) + sorted( self.__external_parsers.copy() )
 	
-	def add_handler( self, new_id, new_function, override = False ) -> bool:
+	def add_handler( self, new_id, new_function, override = False, compiler = None ) -> bool:
 		'''
 		Adds a new external parser to the dictionary
 		Parameters:
@@ -178,12 +362,19 @@ class MacroHandler( HIDPool ):
 			new_function: function name, without ()
 			override: boolean, optional, True to replace preexisting id
 				"KEY", "MEDIA", "MOUSE_CLICK", "MOUSE_MOVE", & "TEXT" cannot be added/overridden
+			compiler: function, optional, used by compile_macro and
+				compile_macro_steps to turn the macro data into the
+				arguments new_function is called with, once, ahead of time;
+				may raise ValueError for data it can't send
 		Returns:
 			boolean, True if successful, False if denied
 		'''
 		if new_id in self.__internal_parsers or (new_id in self.__external_parsers and not override):
 			return False
 		self.__external_parsers[new_id] = new_function
+		self.__compilers.pop( new_id, None )
+		if compiler is not None:
+			self.__compilers[new_id] = compiler
 		return True
 	
 	def del_handler( self, remove_id ) -> bool:
@@ -198,4 +389,140 @@ class MacroHandler( HIDPool ):
 		if remove_id not in self.__external_parsers:
 			return False
 		self.__external_parsers.pop( remove_id )
-		return True
\ No newline at end of file
+		self.__compilers.pop( remove_id, None )
+		return True
+	
+class MacroQueue( object ):
+	'''
+	Output queue for stepwise macros, see MacroHandler.compile_macro_steps
+	Macros are sent one step (one keyboard report) at a time, oldest
+	first, either a few steps per call of service() from a polling loop,
+	or from the run() asyncio task. Scanning carries on between steps.
+	Parameters:
+		macro_comm: MacroHandler, releases held keys on cancel
+		max_depth: integer, most macros waiting or being sent; enqueue()
+			turns macros away beyond that
+		report_delay: float, optional, least seconds between steps, for
+			hosts that drop fast input
+		steps_per_tick: integer, most steps sent per call of service()
+	Metrics:
+		depth: integer, macros waiting or being sent now
+		peak_depth: integer, the largest depth so far
+		sent: integer, steps sent
+		completed, rejected, cancelled: integer, macro counts
+	'''
+	def __init__( self, macro_comm, max_depth = 8, report_delay = 0, steps_per_tick = 4 ) -> None:
+		self.macro_comm = macro_comm
+		self.max_depth = max_depth
+		self.report_delay = report_delay
+		self.steps_per_tick = steps_per_tick
+		self.peak_depth = 0
+		self.sent = 0
+		self.completed = 0
+		self.rejected = 0
+		self.cancelled = 0
+		self.__queue = []  # [ source, steps, started ], oldest first
+		self.__next_step = 0
+		self.__ready = None
+	
+	@property
+	def depth( self ) -> int:
+		return len( self.__queue )
+	
+	def enqueue( self, steps, source = None ) -> bool:
+		'''
+		Queues a macro, or cancels it if it is already queued from the
+		same source, so pressing a key again aborts its macro
+		Parameters:
+			steps: generator, from a compile_macro_steps function
+			source: optional, eg a key number; None never cancels
+		Returns:
+			boolean, True if queued, False if cancelled or turned away
+		'''
+		if source is not None and self.cancel( source ):
+			return False
+		if len( self.__queue ) >= self.max_depth:
+			self.rejected += 1
+			return False
+		self.__queue.append( [ source, steps, False ] )
+		self.peak_depth = max( self.peak_depth, len( self.__queue ) )
+		if self.__ready is not None:
+			self.__ready.set()
+		return True
+	
+	def cancel( self, source ) -> bool:
+		'''
+		Drops the queued macro from a source. A macro cut off part way
+		may have left keys down, so the keyboard is released.
+		Returns:
+			boolean, True if a macro was cancelled
+		'''
+		for _entry in self.__queue:
+			if source == _entry[0]:
+				self.__queue.remove( _entry )
+				self.cancelled += 1
+				if _entry[2]:
+					self.macro_comm.key.release_all()
+				return True
+		return False
+	
+	def clear( self ) -> None:
+		'''Cancels every queued macro'''
+		if self.__queue and self.__queue[0][2]:
+			self.macro_comm.key.release_all()
+		self.cancelled += len( self.__queue )
+		self.__queue.clear()
+	
+	def step( self ) -> bool:
+		'''
+		Sends the next step of the oldest macro
+		Returns:
+			boolean, True if a step was sent, False once the queue is empty
+		'''
+		while self.__queue:
+			_entry = self.__queue[0]
+			_entry[2] = True
+			try:
+				next( _entry[1] )
+			except StopIteration:
+				self.__queue.pop( 0 )
+				self.completed += 1
+				continue
+			self.sent += 1
+			return True
+		return False
+	
+	def service( self, now = None ) -> None:
+		'''
+		Sends up to steps_per_tick steps, no faster than report_delay
+		Call once per pass of a polling main loop
+		Parameter:
+			now: float, optional, time.monotonic() of the caller's loop
+		'''
+		if not self.__queue:
+			return
+		if self.report_delay:
+			if now is None:
+				now = time.monotonic()
+			if now < self.__next_step:
+				return
+			if self.step():
+				self.__next_step = now + self.report_delay
+			return
+		for _ in range( self.steps_per_tick ):
+			if not self.step():
+				return
+	
+	async def run( self ) -> None:
+		'''
+		asyncio task that sends queued macros as they arrive, yielding
+		to other tasks after every step
+		'''
+		import asyncio
+		self.__ready = asyncio.Event()
+		while True:
+			if not self.__queue:
+				self.__ready.clear()
+				await self.__ready.wait()
+			if self.step():
+				await asyncio.sleep( self.report_delay )
@@ -0,0 +1,176 @@
+'''
+MIDI Output (/lib/midi_output.py)
+Written in Adafruit Circuit Python for
+SOFTWARE: adafruit_midi Library
+==========
+Batched MIDI output for the "MIDI" macro type. adafruit_midi message
+objects are turned into bytes once, when the macros are compiled at boot.
+Messages sent during a tick are collected and written to the port with a
+single write when flush() runs, once per tick.
+
+Controllers from controller() keep a control change value on the
+device, for mapping the encoder to a MIDI CC. Turns move the value, and
+flush() sends only the latest value, at most once per min_interval, so a
+fast sweep becomes a few messages rather than one per detent.
+
+Running status (leaving out a status byte that repeats the previous one)
+is available for serial MIDI ports. It is off by default because USB
+MIDI can't use it: every message travels in its own 4-byte USB packet,
+and the TinyUSB stream writer behind usb_midi needs the status byte to
+build that packet.
+'''
+
+import time
+from adafruit_midi.midi_message import MIDIMessage
+
+class MidiOutput:
+    '''
+    Batching MIDI writer
+    Parameters:
+        port: usb_midi.PortOut or busio.UART, the MIDI out port
+        channel: integer, 0-15, wire protocol channel for messages
+            (0 is MIDI channel 1, as with adafruit_midi)
+        running_status: boolean, leave out repeated status bytes; only
+            for serial ports, see above
+        buffer_size: integer, most bytes written per flush; messages
+            that don't fit wait for the next one
+    '''
+    def __init__(self, port, channel=0, running_status=False, buffer_size=256) -> None:
+        self.port = port
+        self.channel = channel
+        self.running_status = running_status
+        self.writes = 0
+        self.bytes_written = 0
+        self._buffer = bytearray(buffer_size)
+        self._pending = []
+        self._status = None
+        self._controllers = []
+
+    def compile(self, *messages) -> tuple:
+        '''
+        Serializes MIDI messages ahead of time; use as the "MIDI" handler's
+        compiler with MacroHandler.add_handler
+        Parameters:
+            messages: adafruit_midi messages, or lists of them
+        Returns:
+            tuple, the bytes of each message
+        Raises:
+            ValueError: something that isn't a MIDI message
+        '''
+        compiled = []
+        for message in messages:
+            if isinstance(message, (tuple, list)):
+                compiled.extend(self.compile(*message))
+            elif isinstance(message, MIDIMessage):
+                message.channel = self.channel
+                compiled.append(bytes(message.__bytes__()))  # bytes(message) doesn't work in uPy
+            elif isinstance(message, (bytes, bytearray)):
+                compiled.append(bytes(message))
+            else:
+                raise ValueError("Not a MIDI message: " + repr(message))
+        return tuple(compiled)
+
+    def send(self, *messages) -> None:
+        '''
+        Queues messages for the next flush()
+        Parameters:
+            messages: bytes from compile(), or adafruit_midi messages
+        '''
+        for message in messages:
+            if not isinstance(message, bytes):
+                for data in self.compile(message):
+                    self.send(data)
+                continue
+            self._pending.append(message)
+
+    def controller(self, control, minimum=0, maximum=127, step=1, value=None, min_interval=0.01):
+        '''
+        Creates a controller whose value is sent by flush()
+        Parameters: see MidiController
+        Returns:
+            MidiController
+        '''
+        controller = MidiController(self, control, minimum, maximum, step, value, min_interval)
+        self._controllers.append(controller)
+        return controller
+
+    def flush(self, now=None) -> None:
+        '''
+        Queues controllers' changed values, then writes the queued messages
+        to the port in one write; call once per tick
+        Parameters:
+            now: float, optional, time.monotonic() of the caller's tick
+        '''
+        if self._controllers:
+            if now is None:
+                now = time.monotonic()
+            for controller in self._controllers:
+                controller.update(now)
+        if not self._pending:
+            return
+        buffer = self._buffer
+        length = 0
+        sent = 0
+        for message in self._pending:
+            status = message[0]
+            skip = 1 if self.running_status and status == self._status and status < 0xF0 else 0
+            end = length + len(message) - skip
+            if end > len(buffer):
+                if not sent:  # Too big for the buffer on its own, e.g. a long SysEx
+                    self.port.write(message, len(message))
+                    sent = 1
+                break
+            buffer[length:end] = message[skip:]
+            length = end
+            sent += 1
+            if status < 0xF0:
+                self._status = status
+            elif status < 0xF8:
+                self._status = None  # System common messages cancel running status
+        del self._pending[:sent]
+        if length:
+            self.port.write(buffer, length)
+            self.writes += 1
+            self.bytes_written += length
+
+class MidiController:
+    '''
+    Control change value kept on the device and moved by encoder turns
+    Parameters:
+        output: MidiOutput, sends the value
+        control: integer, 0-127, controller number
+        minimum, maximum: integers, 0-127, range of the value
+        step: integer, value change per detent
+        value: integer, optional, starting value; defaults to minimum,
+            and is only sent once it changes
+        min_interval: float, least seconds between messages; changes in
+            between are merged into the next one
+    '''
+    def __init__(self, output, control, minimum=0, maximum=127, step=1, value=None, min_interval=0.01) -> None:
+        if not (0 <= control <= 127 and 0 <= minimum <= maximum <= 127):
+            raise ValueError(f"Bad MIDI_CC {control} range {minimum}-{maximum}")
+        self.output = output
+        self.control = control
+        self.minimum = minimum
+        self.maximum = maximum
+        self.step = step
+        self.value = minimum if value is None else max(minimum, min(value, maximum))
+        self.min_interval = min_interval
+        self._sent = self.value
+        self._next_send = 0
+
+    def turn(self, delta, velocity=0) -> None:
+        '''
+        Moves the value by delta steps, within the range; an encoder action
+        Parameters:
+            delta: integer, signed detents
+            velocity: float, unused, detents per second
+        '''
+        self.value = max(self.minimum, min(self.value + delta * self.step, self.maximum))
+
+    def update(self, now) -> None:
+        '''Queues the value if it has changed and min_interval has passed'''
+        if self.value != self._sent and now >= self._next_send:
+            self._sent = self.value
+            self._next_send = now + self.min_interval
+            self.output.send(bytes((0xB0 | (self.output.channel & 0x0F), self.control, self.value)))
@@ -0,0 +1,108 @@
+'''
+Partial-update SSD1306 (/lib/partial_ssd1306.py)
+Written in Adafruit Circuit Python for
+HARDWARE: SSD1306 OLED on I2C
+==========
+Drop-in replacement for adafruit_ssd1306.SSD1306_I2C whose show() only
+sends the part of the framebuffer that changed since the last show().
+A copy of what the panel is displaying is kept alongside the framebuffer.
+Each 8-pixel page is compared against it, and only the changed column
+range is sent, using the controller's column and page address window.
+'''
+
+from adafruit_ssd1306 import SSD1306_I2C
+
+_SET_COL_ADDR = 0x21
+_SET_PAGE_ADDR = 0x22
+# Bytes spent on one address window: the command transaction (control
+# byte plus six command bytes) and the control byte ahead of the data.
+_WINDOW_OVERHEAD = 8
+
+class PartialSSD1306_I2C(SSD1306_I2C):
+    '''
+    SSD1306_I2C that pushes only dirty regions to the display
+    Parameters: same as adafruit_ssd1306.SSD1306_I2C
+    '''
+    def __init__(self, width, height, i2c, **kwargs) -> None:
+        # show() is called during the parent's init; until the copy of the
+        # panel contents exists it falls back to a full update.
+        self._sent = None
+        super().__init__(width, height, i2c, **kwargs)
+        self._col_offset = (128 - width) // 2 if width != 128 else 0
+        self._window = bytearray(7)  # Co=0, D/C#=0, then six command bytes
+        self._window[1] = _SET_COL_ADDR
+        self._window[4] = _SET_PAGE_ADDR
+        self._data = bytearray(len(self.buffer))
+        self._data[0] = 0x40  # Co=0, D/C#=1
+        self._sent = bytearray(self.buffer)
+
+    def invalidate(self) -> None:
+        '''
+        Forgets what the panel is showing, so the next show() sends the
+        whole framebuffer, e.g. after the display has been reset
+        '''
+        self._sent = None
+
+    def show(self) -> None:
+        '''
+        Sends the changed part of the framebuffer to the display
+        '''
+        if self._sent is None or self.page_addressing:
+            super().show()
+            self._sent = bytearray(self.buffer)
+            return
+        width = self.width
+        buffer = self.buffer
+        sent = self._sent
+        dirty = []
+        for page in range(self.pages):
+            start = 1 + page * width
+            end = start + width
+            if buffer[start:end] == sent[start:end]:
+                continue
+            x0 = 0
+            while buffer[start + x0] == sent[start + x0]:
+                x0 += 1
+            x1 = width - 1
+            while buffer[start + x1] == sent[start + x1]:
+                x1 -= 1
+            dirty.append((page, x0, x1))
+        if not dirty:
+            return
+        # Either one window around all dirty pages, or one window per
+        # page, whichever puts fewer bytes on the bus.
+        p0 = dirty[0][0]
+        p1 = dirty[-1][0]
+        x0 = min(d[1] for d in dirty)
+        x1 = max(d[2] for d in dirty)
+        per_page = 0
+        for _page, _x0, _x1 in dirty:
+            per_page += _WINDOW_OVERHEAD + _x1 - _x0 + 1
+        if _WINDOW_OVERHEAD + (p1 - p0 + 1) * (x1 - x0 + 1) <= per_page:
+            self._write_window(x0, x1, p0, p1)
+        else:
+            for page, _x0, _x1 in dirty:
+                self._write_window(_x0, _x1, page, page)
+
+    def _write_window(self, x0, x1, p0, p1) -> None:
+        # Sets the controller's address window, then streams the window's
+        # bytes from the framebuffer in one transaction. Horizontal
+        # addressing wraps at the window edge, so rows go out back to back.
+        self._window[2] = x0 + self._col_offset
+        self._window[3] = x1 + self._col_offset
+        self._window[5] = p0
+        self._window[6] = p1
+        with self.i2c_device:
+            self.i2c_device.write(self._window)
+        buffer = memoryview(self.buffer)
+        sent = memoryview(self._sent)
+        data = memoryview(self._data)
+        span = x1 - x0 + 1
+        pos = 1
+        for page in range(p0, p1 + 1):
+            start = 1 + page * self.width + x0
+            data[pos:pos + span] = buffer[start:start + span]
+            sent[start:start + span] = buffer[start:start + span]
+            pos += span
+        with self.i2c_device:
+            self.i2c_device.write(self._data, end=pos)
@@ -50,6 +50,12 @@ For Pico RGB Keypad Base:
 
 import time
 
+# Key event types, as queued by `PMK.update()` and returned by
+# `PMK.get_event()`.
+PRESS = 0
+RELEASE = 1
+HOLD = 2
+
 class PMK(object):
     """
     Represents a set of Key instances with
@@ -68,31 +74,64 @@ class PMK(object):
         self.was_asleep = False
         self.last_led_states = None
         self.rotation = 0
+        self.switch_bits = 0
+        self.events = []
+        self.max_events = 32
 
         for i in range(self.hardware.num_keys()):
             _key = Key(i, self.hardware)
+            _key.events = self.events
             self.keys.append(_key)
 
+        # Keys by hardware number, which rotate() leaves alone
+        self._hw_keys = list(self.keys)
+
+        # Set by the first `update()`: True if the switches are scanned in
+        # the background (`keypad.Keys`) and their changes are taken as
+        # events instead of polling every key.
+        self.event_driven = None
+        self._active_keys = 0
+        self._last_update = 0
+
     def update(self):
         # Call this in each iteration of your while loop to update
         # to update everything's state, e.g. `keybow.update()`
 
-        for _key in self.keys:
-            _key.update()
+        now = time.monotonic()
+        changes = None
+        if self.event_driven is not False:
+            changes = self.hardware.read_switch_events(now)
+            if self.event_driven is None:
+                self._start(changes is not None, now)
+        if self.event_driven:
+            self._apply_switch_events(changes, now)
+        else:
+            # Take one snapshot of all the switches, and one timestamp, per
+            # scan and share them between the keys, rather than having each
+            # key read its own switch and the clock.
+            self.switch_bits = self.hardware.read_all_switches()
+
+            for _key in self.keys:
+                _key.update((self.switch_bits >> _key.hw_number) & 1, now)
+
+        # If nobody is draining the event queue, drop the oldest events
+        # rather than let it grow without bound.
+        if len(self.events) > self.max_events:
+            del self.events[:len(self.events) - self.max_events]
 
         # Used to work out the sleep behaviour, by keeping track
         # of the time of the last key press.
-        if self.any_pressed():
-            self.time_of_last_press = time.monotonic()
+        if self.switch_bits:
+            self.time_of_last_press = now
             self.sleeping = False
 
-        self.time_since_last_press = time.monotonic() - self.time_of_last_press
+        self.time_since_last_press = now - self.time_of_last_press
 
         # If LED sleep is enabled, but not engaged, check if enough time
         # has elapsed to engage sleep. If engaged, record the state of the
         # LEDs, so it can be restored on wake.
         if self.led_sleep_enabled and not self.sleeping:
-            if time.monotonic() - self.time_of_last_press > self.led_sleep_time:
+            if self.time_since_last_press > self.led_sleep_time:
                 self.sleeping = True
                 self.last_led_states = [k.rgb if k.lit else [0, 0, 0] for k in self.keys]
                 self.set_all(0, 0, 0)
@@ -104,17 +143,87 @@ class PMK(object):
                 self.keys[k].set_led(*self.last_led_states[k])
             self.was_asleep = False
 
-    def set_led(self, number, r, g, b):
+        # Send any LED changes made since the last update in one go.
+        self.hardware.show()
+
+    def _start(self, event_driven, now):
+        # Settles, on the first scan, whether the switches give events.
+
+        self.event_driven = event_driven
+        if event_driven:
+            # The scanner has already debounced the switches, so the keys
+            # don't again. Start every key off as released.
+            self._last_update = now
+            for _key in self.keys:
+                _key.debounce = 0
+                _key.update(0, now)
+
+    def _apply_switch_events(self, changes, now):
+        # Runs the key logic for each switch change, in order and at the
+        # time it happened, so a press shorter than a scan still gives a
+        # press and a release. Only keys that changed, or are still down
+        # and need their hold timing, are updated; idle keys cost nothing.
+
+        bits = self.switch_bits
+        active = self._active_keys
+        for idx, pressed, at in changes:
+            # Never step a key back before its last update
+            at = min(max(at, self._last_update), now)
+            if pressed:
+                bits |= 1 << idx
+                # Counts for LED sleep even if released again before now
+                self.time_of_last_press = at
+                self.sleeping = False
+            else:
+                bits &= ~(1 << idx)
+            self._hw_keys[idx].update(1 if pressed else 0, at)
+            active |= 1 << idx
+        self.switch_bits = bits
+        self._last_update = now
+
+        idx = 0
+        while active >> idx:
+            if active & (1 << idx):
+                _key = self._hw_keys[idx]
+                _key.update((bits >> idx) & 1, now)
+                if not (_key.state or _key.debounced_state or _key.last_state):
+                    active &= ~(1 << idx)
+            idx += 1
+        self._active_keys = active
+
+    def show(self):
+        # Sends buffered LED changes to the hardware straight away, rather
+        # than waiting for the next `update()`.
+
+        self.hardware.show()
+
+    def get_event(self):
+        # Returns the oldest queued key event as a `(number, event, time)`
+        # tuple, where `event` is one of PRESS, RELEASE or HOLD and `time`
+        # is the `time.monotonic()` of the scan that saw it, or None if
+        # there are no events waiting. Events are debounced, so each
+        # physical press gives exactly one PRESS and one RELEASE.
+
+        if self.events:
+            return self.events.pop(0)
+        return None
+
+    def clear_events(self):
+        # Discard any queued key events.
+
+        del self.events[:]
+
+    def set_led(self, number, r, g, b, force=False):
         # Set an individual key's LED to an RGB value by its number.
 
-        self.keys[number].set_led(r, g, b)
+        self.keys[number].set_led(r, g, b, force)
 
-    def set_all(self, r, g, b):
+    def set_all(self, r, g, b, force=False):
         # Set all of Keybow's LEDs to an RGB value.
 
         if not self.sleeping:
             for _key in self.keys:
-                _key.set_led(r, g, b)
+                _key.set_led(r, g, b, force)
         else:
             for _key in self.keys:
                 _key.led_off()
@@ -270,6 +379,7 @@ class Key:
         self.modifier = False
         self.rgb = [0, 0, 0]
         self.lit = False
+        self.led_rgb = None
         self.led_off()
         self.press_function = None
         self.release_function = None
@@ -278,6 +388,10 @@ class Key:
         self.hold_func_fired = False
         self.debounce = 0.125
         self.key_locked = False
+        self.events = None
+        self.debounced_state = 0
+        self.time_of_last_edge = 0
+        self.hold_queued = False
         self.update_xy()
 
     def get_state(self):
@@ -285,11 +399,17 @@ class Key:
 
         return int(self.hardware.switch_state(self.hw_number))
 
-    def update(self):
+    def update(self, state=None, now=None):
         # Updates the state of the key and updates all of its
-        # attributes.
+        # attributes. `PMK.update()` passes in the switch state and the
+        # time of its scan; if they are omitted, the key reads its own.
 
-        self.time_since_last_press = time.monotonic() - self.time_of_last_press
+        if state is None:
+            state = self.get_state()
+        if now is None:
+            now = time.monotonic()
+
+        self.time_since_last_press = now - self.time_of_last_press
 
         # Keys get locked during the debounce time.
         if self.time_since_last_press < self.debounce:
@@ -297,9 +417,9 @@ class Key:
         else:
             self.key_locked = False
 
-        self.state = self.get_state()
+        self.state = state
         self.pressed = self.state
-        update_time = time.monotonic()
+        update_time = now
 
         # If there's a `press_function` attached, then call it,
         # returning the key object and the pressed state.
@@ -344,6 +464,24 @@ class Key:
             self.held = False
             self.hold_func_fired = False
 
+        # Queue debounced edges for `PMK.get_event()`. A change of state
+        # is only accepted once `debounce` has passed since the last
+        # accepted edge, so switch chatter doesn't turn into extra events.
+        if self.state != self.debounced_state and now - self.time_of_last_edge >= self.debounce:
+            self.debounced_state = self.state
+            self.time_of_last_edge = now
+            self.hold_queued = False
+            self.queue_event(PRESS if self.state else RELEASE, now)
+        elif self.debounced_state and not self.hold_queued and now - self.time_of_last_edge > self.hold_time:
+            self.hold_queued = True
+            self.queue_event(HOLD, now)
+
+    def queue_event(self, event, now):
+        # Adds an event for this key to its PMK's event queue, if it has one.
+
+        if self.events is not None:
+            self.events.append((self.number, event, now))
+
     def update_xy(self):
         self.xy = self.get_xy()
         self.x, self.y = self.xy
@@ -367,8 +505,10 @@ class Key:
         else:
             return False
 
-    def set_led(self, r, g, b):
-        # Set this key's LED to an RGB value.
+    def set_led(self, r, g, b, force=False):
+        # Set this key's LED to an RGB value. The hardware is only written
+        # when the colour differs from the last one sent, unless `force`
+        # is set, e.g. after something else has written to the LEDs.
 
         if [r, g, b] == [0, 0, 0]:
             self.lit = False
@@ -376,6 +516,10 @@ class Key:
             self.lit = True
             self.rgb = [r, g, b]
 
+        if not force and self.led_rgb == (r, g, b):
+            return
+
+        self.led_rgb = (r, g, b)
         self.hardware.set_pixel(self.hw_number, r, g, b)
 
     def led_on(self):
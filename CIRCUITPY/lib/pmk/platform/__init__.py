@@ -8,11 +8,20 @@ class PMK:
     def set_pixel(self, idx, r, g, b):
         self._display.set_pixel(idx, r, g, b)
 
+    def show(self):
+        self._display.show()
+
     def num_keys(self):
         return self._switches.num_switches()
 
     def switch_state(self, idx):
         return self._switches.switch_state(idx)
 
+    def read_all_switches(self):
+        return self._switches.read_all_switches()
+
+    def read_switch_events(self, now):
+        return self._switches.read_events(now)
+
     def i2c(self):
         return self._i2c
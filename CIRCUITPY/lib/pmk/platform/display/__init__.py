@@ -4,3 +4,8 @@ class Display:
     """
     def set_pixel(self, idx, r, g, b):
         raise NotImplementedError
+
+    def show(self):
+        # Sends any buffered pixel changes to the hardware. Displays that
+        # write every set_pixel straight through have nothing to do here.
+        pass
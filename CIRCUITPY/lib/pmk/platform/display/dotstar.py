@@ -5,9 +5,25 @@ from . import Display
 class Dotstar(Display):
     """
     Display consisting of dotstars
+
+    Pixel changes are buffered, and show sends the whole strip in a
+    single SPI frame, only when something has changed.
     """
     def __init__(self, clock, data, count):
-        self._pixels = adafruit_dotstar.DotStar(clock, data, count)
+        self._pixels = adafruit_dotstar.DotStar(clock, data, count, auto_write=False)
+        self._dirty = False
+
+    @property
+    def dirty(self):
+        # True while there are pixel changes that show hasn't sent yet
+        return self._dirty
 
     def set_pixel(self, idx, r, g, b):
         self._pixels[idx] = (r, g, b)
+        self._dirty = True
+
+    def show(self):
+        if not self._dirty:
+            return
+        self._pixels.show()
+        self._dirty = False
@@ -1,13 +1,61 @@
+from adafruit_bus_device.i2c_device import I2CDevice
 from adafruit_is31fl3731.keybow2040 import Keybow2040 as Pixels
 
 from . import Display
 
+NUM_PIXELS = 16
+
+# IS31FL3731 I2C address on the Keybow 2040
+_ADDRESS = 0x74
+# Bank (page) select register, written to pick the frame to write to
+_BANK_ADDRESS = 0xFD
+# Start of the PWM (brightness) registers in each IS31FL3731 frame
+_COLOR_OFFSET = 0x24
+
 class Keybow2040(Display):
     """
     Keybow 2040 4x4 display
+
+    With auto_write off, set_pixel only updates a local copy of the
+    frame's PWM registers, and show sends the whole frame to the
+    IS31FL3731 in a single block write. show writes through its own
+    I2CDevice rather than the driver's private methods; the driver
+    still sets the chip up and picks the frame written to.
     """
-    def __init__(self, i2c):
-        self._pixels = Pixels(i2c)
+    def __init__(self, i2c, auto_write=True):
+        self._pixels = Pixels(i2c, address=_ADDRESS)
+        # The driver has already probed the chip
+        self._device = I2CDevice(i2c, _ADDRESS, probe=False)
+        self._bank_select = bytearray((_BANK_ADDRESS, 0))
+        self.auto_write = auto_write
+        # PWM register offsets of each key's red, green and blue LEDs,
+        # mapped the same way as Pixels.pixelrgb()
+        self._addresses = []
+        for idx in range(NUM_PIXELS):
+            x = (4 * (3 - idx % 4)) + idx // 4
+            self._addresses.append((Pixels.pixel_addr(x, 0),
+                                    Pixels.pixel_addr(x, 1),
+                                    Pixels.pixel_addr(x, 2)))
+        # Start register followed by all 144 PWM registers of a frame
+        self._frame = bytearray(145)
+        self._frame[0] = _COLOR_OFFSET
+        self._dirty = False
 
     def set_pixel(self, idx, r, g, b):
-        self._pixels.pixelrgb(idx % 4, idx // 4, r, g, b)
+        red, green, blue = self._addresses[idx]
+        self._frame[1 + red] = r
+        self._frame[1 + green] = g
+        self._frame[1 + blue] = b
+        if self.auto_write:
+            self._pixels.pixelrgb(idx % 4, idx // 4, r, g, b)
+        else:
+            self._dirty = True
+
+    def show(self):
+        if not self._dirty:
+            return
+        self._bank_select[1] = self._pixels.frame()
+        with self._device as device:
+            device.write(self._bank_select)
+            device.write(self._frame)
+        self._dirty = False
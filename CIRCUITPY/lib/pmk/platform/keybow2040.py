@@ -28,4 +28,6 @@ class Keybow2040(PMK):
         # Use provided I2C instance, or default to board.I2C()
         self._i2c = i2c if i2c else board.I2C()
         self._switches = Switches(_PINS)
-        self._display = Display(self._i2c)  # Pass the shared I2C instance here for LED control
+        # Pass the shared I2C instance here for LED control. Pixel changes
+        # are buffered and sent as one frame by show().
+        self._display = Display(self._i2c, auto_write=False)
@@ -18,21 +18,38 @@ _ROTATED = {
 }
 
 class RGBKeypadBase(PMK):
-    def __init__(self, i2c=None):
+    def __init__(self, i2c=None, cached=False, int_pin=None):
         # Use the provided I2C instance, or default to busio.I2C on GP5 and GP4
+        # `cached` and `int_pin` are passed on to the TCA9555 switches.
         self._i2c = i2c if i2c else busio.I2C(board.GP5, board.GP4)
-        self._switches = Switches(self._i2c, NUM_KEYS)
+        self._switches = Switches(self._i2c, NUM_KEYS, cached=cached, int_pin=int_pin)
         self._display = Display(board.GP18, board.GP19, NUM_KEYS)
         self._cs = DigitalInOut(board.GP17)
         self._cs.direction = Direction.OUTPUT
         self._cs.value = 1
 
     def set_pixel(self, idx, r, g, b):
+        # Buffered by the display; sent by show()
+        super().set_pixel(_ROTATED[idx], r, g, b)
+
+    def show(self):
         # https://github.com/pimoroni/pimoroni-pico/blob/main/libraries/pico_rgb_keypad/pico_rgb_keypad.cpp#L20-L45
-        # code above sets CS only for the time of updating LEDs, so let's do the same
+        # code above sets CS only for the time of updating LEDs, so let's do the same,
+        # once around the whole frame, and not at all when nothing has changed
+        if not self._display.dirty:
+            return
         self._cs.value = 0
-        super().set_pixel(_ROTATED[idx], r, g, b)
+        super().show()
         self._cs.value = 1
 
     def switch_state(self, idx):
         return super().switch_state(_ROTATED[idx])
+
+    def read_all_switches(self):
+        # Remap the expander's bitmask into Keybow2040 orientation.
+        raw = super().read_all_switches()
+        bits = 0
+        for idx in range(NUM_KEYS):
+            if raw & (1 << _ROTATED[idx]):
+                bits |= 1 << idx
+        return bits
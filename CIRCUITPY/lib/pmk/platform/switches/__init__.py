@@ -7,3 +7,20 @@ class Switches:
 
     def switch_state(self, idx):
         raise NotImplementedError
+
+    def read_all_switches(self):
+        # Returns the state of every switch as a bitmask, with bit n set
+        # when switch n is pressed. Subclasses should override this with a
+        # single bulk read where the hardware allows it.
+        bits = 0
+        for idx in range(self.num_switches()):
+            if self.switch_state(idx):
+                bits |= 1 << idx
+        return bits
+
+    def read_events(self, now):
+        # Returns the switch changes since the last call as a list of
+        # `(idx, pressed, time)` tuples, oldest first, with `time` on the
+        # `time.monotonic()` clock, or None if the switches can only be
+        # polled. `now` is the caller's `time.monotonic()`.
+        return None
@@ -1,19 +1,105 @@
 from digitalio import DigitalInOut, Direction, Pull
 
+try:
+    import keypad
+    import supervisor
+except ImportError:
+    keypad = None
+
 from . import Switches
 
+# supervisor.ticks_ms(), and so keypad event timestamps, wrap at 2**29
+_TICKS_MASK = (1 << 29) - 1
+
 class GPIO(Switches):
     """
     Switches connected directly to GPIO
+
+    Where the firmware has the `keypad` module, a `keypad.Keys` scanner
+    watches all the pins in the background and debounces them in C.
+    `read_all_switches` then only applies the events it has queued since
+    the last call to a bitmask, rather than reading every pin from
+    Python. Without `keypad`, or with `use_keypad=False`, every pin is
+    read in one pass of a tight loop instead.
+
+    With `keypad`, `read_events` also hands out each change, with the
+    time the scanner saw it, so `PMK` can update only the keys that
+    changed and still see presses shorter than one of its scans.
     """
-    def __init__(self, pins):
-        self._switches = [DigitalInOut(pin) for pin in pins]
-        for switch in self._switches:
-            switch.direction = Direction.INPUT
-            switch.pull = Pull.UP
+    def __init__(self, pins, use_keypad=True, interval=0.02):
+        self._count = len(pins)
+        self._bits = 0
+        self._keys = None
+        self._switches = None
+        self._changes = []
+        self._collect = False
+        if use_keypad and keypad is not None:
+            # The switches pull low when pressed.
+            self._keys = keypad.Keys(pins, value_when_pressed=False, pull=True, interval=interval)
+            self._event = keypad.Event()
+        else:
+            self._switches = [DigitalInOut(pin) for pin in pins]
+            for switch in self._switches:
+                switch.direction = Direction.INPUT
+                switch.pull = Pull.UP
 
     def num_switches(self):
-        return len(self._switches)
+        return self._count
 
     def switch_state(self, idx):
+        if self._keys is not None:
+            return bool(self.read_all_switches() & (1 << idx))
         return not self._switches[idx].value
+
+    def read_all_switches(self):
+        if self._keys is not None:
+            return self._read_events()
+        # The switches pull low when pressed, so a low pin sets its bit.
+        bits = 0
+        bit = 1
+        for switch in self._switches:
+            if not switch.value:
+                bits |= bit
+            bit <<= 1
+        return bits
+
+    def read_events(self, now):
+        if self._keys is None:
+            return None
+        # From the first call on, changes are kept for the next one, even
+        # if they are read by `read_all_switches` in between.
+        self._collect = True
+        self._read_events()
+        changes = self._changes
+        if changes:
+            ticks = supervisor.ticks_ms()
+            for i, (idx, pressed, timestamp) in enumerate(changes):
+                changes[i] = (idx, pressed, now - ((ticks - timestamp) & _TICKS_MASK) / 1000)
+            self._changes = []
+        return changes
+
+    def _read_events(self):
+        events = self._keys.events
+        if events.overflowed:
+            # Events were lost, so start again from the keys held now,
+            # which reset() reports afresh as presses. Every key that was
+            # down is released first, so none is left stuck down.
+            events.clear()
+            self._keys.reset()
+            if self._collect:
+                ticks = supervisor.ticks_ms()
+                for idx in range(self._count):
+                    if self._bits & (1 << idx):
+                        self._changes.append((idx, False, ticks))
+            self._bits = 0
+        event = self._event
+        bits = self._bits
+        while events.get_into(event):
+            if event.pressed:
+                bits |= 1 << event.key_number
+            else:
+                bits &= ~(1 << event.key_number)
+            if self._collect:
+                self._changes.append((event.key_number, event.pressed, event.timestamp))
+        self._bits = bits
+        return bits
@@ -1,22 +1,57 @@
+from digitalio import DigitalInOut, Direction, Pull
+
 from . import Switches
 
+_ADDRESS = 0x20
+_INPUT_PORT0 = 0x00
+
 class TCA9555(Switches):
     """
     Switches connected via TCA9555 IO expander on i2c
+
+    Both input ports are read in a single transaction into a preallocated
+    buffer. With `cached` set, `switch_state` answers from the snapshot
+    taken by the last `read_all_switches` call (which `PMK.update()` makes
+    once per scan) instead of going back to the bus. If the expander's INT
+    pin is wired up, pass it as `int_pin` and the read is skipped entirely
+    while the expander reports no change.
     """
-    def __init__(self, i2c, count):
+    def __init__(self, i2c, count, cached=False, int_pin=None):
         self._count = count
         self._i2c = i2c
+        self._cached = cached
+        self._mask = (1 << count) - 1 # up to 16 buttons supported now
+        self._command = bytes((_INPUT_PORT0,))
+        self._buffer = bytearray(2)
+        self._snapshot = None
+        self._int = None
+        if int_pin is not None:
+            self._int = DigitalInOut(int_pin)
+            self._int.direction = Direction.INPUT
+            self._int.pull = Pull.UP
 
     def num_switches(self):
         return self._count
 
-    def switch_state(self, idx):
-        buffer = bytearray(self._count // 8)
-        buffer[0] = 0x0
+    def _read_ports(self):
+        # INT is active low and is cleared by reading the input ports, so
+        # while it stays high the last snapshot is still current.
+        if self._int is not None and self._snapshot is not None and self._int.value:
+            return self._snapshot
         while not self._i2c.try_lock():
             pass
-        self._i2c.writeto_then_readfrom(0x20, buffer, buffer, out_end=1)
-        self._i2c.unlock()
-        b = buffer[0] | buffer[1] << 8 # up to 16 buttons supported now
-        return not (1 << idx) & b
+        try:
+            self._i2c.writeto_then_readfrom(_ADDRESS, self._command, self._buffer)
+        finally:
+            self._i2c.unlock()
+        # Inputs read low when pressed.
+        self._snapshot = ~(self._buffer[0] | self._buffer[1] << 8) & self._mask
+        return self._snapshot
+
+    def switch_state(self, idx):
+        if not self._cached or self._snapshot is None:
+            self._read_ports()
+        return bool(self._snapshot & (1 << idx))
+
+    def read_all_switches(self):
+        return self._read_ports()
@@ -0,0 +1,50 @@
+'''
+Scheduler (/lib/scheduler.py)
+Written in Adafruit Circuit Python
+==========
+Runs the firmware as cooperative asyncio tasks, each at its own rate,
+instead of one loop doing everything at whatever rate it manages. Needs
+the asyncio and adafruit_ticks libraries from the CircuitPython bundle.
+
+    run((1000, scan_keys), (30, update_display), macro_output())
+
+Periodic tasks are plain functions called with time.monotonic(). A task
+is called again one period after its last scheduled time, not after it
+returned, so its rate doesn't drift with how long it takes. If it falls
+behind it skips ahead rather than running back-to-back to catch up.
+Between calls the task sleeps, so the board idles until the next task
+is due.
+'''
+
+import time
+import asyncio
+
+async def every(rate, step):
+    '''
+    Calls a function at a fixed rate, forever
+    Parameters:
+        rate: float, calls per second
+        step: function(now), now being time.monotonic() at the call
+    '''
+    interval = 1 / rate
+    due = time.monotonic()
+    while True:
+        now = time.monotonic()
+        step(now)
+        due += interval
+        delay = due - time.monotonic()
+        if delay < 0:  # Overran; start again from now rather than bunching calls
+            due = time.monotonic()
+            delay = 0
+        await asyncio.sleep(delay)
+
+def run(*tasks):
+    '''
+    Runs tasks until one of them raises
+    Parameters:
+        tasks: each either a (rate, function) pair, for every(), or a
+            coroutine to run as it is
+    '''
+    async def main():
+        await asyncio.gather(*(every(*task) if isinstance(task, tuple) else task for task in tasks))
+    asyncio.run(main())
@@ -0,0 +1,117 @@
+'''
+Tap/Hold Keys (/lib/tap_hold.py)
+Written in Adafruit Circuit Python
+==========
+Dual-function keys, set in config.layers as
+    {"tap": macro, "hold": macro}
+A key released within hold_time of its press sends its tap macro, on the
+release. A key still held at hold_time sends its hold macro there and
+then, without waiting for the release. Either macro can be left out.
+
+Keys pressed while a tap/hold key is still being decided wait for it,
+so their macros are sent after its tap or hold macro, in the order the
+keys were pressed. That takes hold_time at most. With permissive_hold,
+pressing and releasing another key while a tap/hold key is still down
+decides it as a hold at once, as for a modifier, so the wait ends with
+that release.
+
+TapHoldResolver only keeps times and sends nothing itself: each decided
+action is handed to a fire function, e.g. one that queues the macro.
+'''
+
+# Decisions about a pending key press
+_UNDECIDED = 0
+_TAP = 1
+_HOLD = 2
+_PLAIN = 3
+
+class TapHold:
+    '''
+    Tap and hold actions of one key, as made by config_compiler.compile_layers
+    Parameters:
+        tap: function, or None, the action for a tap
+        hold: function, or None, the action for a hold
+    '''
+    def __init__(self, tap, hold) -> None:
+        self.tap = tap
+        self.hold = hold
+
+class TapHoldResolver:
+    '''
+    Decides tap/hold key presses and passes on every key's action in order
+    Parameters:
+        fire: function(key, action), called with each action to send
+        hold_time: float, seconds a tap/hold key is held for a hold
+        permissive_hold: boolean, a tap of another key while a tap/hold
+            key is down makes it a hold
+    '''
+    def __init__(self, fire, hold_time=0.2, permissive_hold=False) -> None:
+        self.fire = fire
+        self.hold_time = hold_time
+        self.permissive_hold = permissive_hold
+        self._pending = []  # [key, action, press time, decision], in press order
+
+    def press(self, key, action, now) -> None:
+        '''
+        Handles a key press
+        Parameters:
+            key: integer, key number
+            action: function, or TapHold, the key's action in the current layer
+            now: float, time of the press
+        '''
+        if isinstance(action, TapHold):
+            self._pending.append([key, action, now, _UNDECIDED])
+        elif self._pending:
+            self._pending.append([key, action, now, _PLAIN])  # Waits for the keys ahead of it
+        else:
+            self.fire(key, action)
+
+    def release(self, key, now) -> None:
+        '''
+        Handles a key release
+        Parameters:
+            key: integer, key number
+            now: float, time of the release
+        '''
+        for index, entry in enumerate(self._pending):
+            if entry[0] != key:
+                continue
+            if entry[3] == _UNDECIDED:
+                entry[3] = _TAP if now - entry[2] < self.hold_time else _HOLD
+            elif entry[3] == _PLAIN and self.permissive_hold:
+                # A tap of this key while the tap/hold keys ahead of it
+                # were down makes them holds
+                for earlier in self._pending[:index]:
+                    if earlier[3] == _UNDECIDED:
+                        earlier[3] = _HOLD
+            break
+        self._send_decided()
+
+    def update(self, now) -> None:
+        '''
+        Decides tap/hold keys held for hold_time as holds; call every scan
+        Parameters:
+            now: float, time.monotonic() of the caller's tick
+        '''
+        if not self._pending:
+            return
+        for entry in self._pending:
+            if entry[3] == _UNDECIDED and now - entry[2] >= self.hold_time:
+                entry[3] = _HOLD
+        self._send_decided()
+
+    def _send_decided(self):
+        # Decided presses are sent in press order; an undecided press holds
+        # back the ones after it
+        pending = self._pending
+        while pending:
+            key, action, _, decision = pending[0]
+            if decision == _UNDECIDED:
+                return
+            pending.pop(0)
+            if decision == _TAP:
+                action = action.tap
+            elif decision == _HOLD:
+                action = action.hold
+            if action is not None:
+                self.fire(key, action)
@@ -0,0 +1,345 @@
+"""
+Benchmarks the firmware on simulated hardware and compares the results
+with a stored baseline.
+
+    python sim/bench.py                 # run and compare with the baseline
+    python sim/bench.py --save          # run and store a new baseline
+
+Measures:
+
+* main loop time and key-to-HID-report latency (p50/p99), running the
+  unmodified code.py against a timeline of key taps
+* PMK.update() time on its own, with no bus traffic, as keys are
+  pressed and released in turn
+* keyboard reports per send and reports per second for the TEXT, UTF16
+  and MOD+ macros in config.py, compiled and through send_macro()
+* I2C bytes per second while idle, and per layer switch, for each
+  device
+* MIDI bytes sent for timelines/midi_retrigger.txt, which taps the same
+  MIDI keys twice each
+
+Byte and report counts are exact and should only change with the code.
+Everything is timed on the simulator's clock (keybow_sim/clock.py),
+which counts sleeps and CPU time at a nominal host speed, but not the
+time the host spends on other work. Each result is the median of
+several runs, and timings are compared with a 25% tolerance. The same
+scan and macro timings can be taken on the board itself with
+keybow_bench.run() (CIRCUITPY/lib/keybow_bench.py).
+"""
+
+import argparse
+import contextlib
+import gc
+import io
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from keybow_sim import (  # noqa: E402
+    ENCODER_ADDRESS, LED_ADDRESS, NUM_KEYS, OLED_ADDRESS, Simulation, Timeline,
+)
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_baseline.json")
+TIMELINES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "timelines")
+
+# Allowed drift for timings, as a fraction of the baseline value
+TIMING_TOLERANCE = 0.25
+
+# Macro timings are the median of several batches. Scan batches all
+# make the same scans, and each scan counts with its fastest time; host
+# noise only ever adds time
+SCAN_BATCHES = 10
+MACRO_BATCHES = 10
+# A key changes every SCAN_EDGE_EVERY scans, so p99 is the cost of a scan
+# that finds an edge rather than the host's noise
+SCAN_EDGE_EVERY = 20
+
+TAP_INTERVAL = 0.15
+# Taps start at ten different points of the 1 ms key scan period, so the
+# latency includes the wait for the next scan
+TAP_PHASES = 10
+TAP_PHASE_STEP = 0.0001
+LAYER_SWITCH_AT = 0.5
+LAYER_SWITCH_SETTLE = 1.5  # Long enough for the numeral and then the labels
+
+# Seesaw NeoPixel writes start with the NeoPixel module base; everything
+# else on the encoder is polling
+_SEESAW_NEOPIXEL_BASE = 0x0E
+
+_DEVICES = {LED_ADDRESS: "leds", OLED_ADDRESS: "oled", ENCODER_ADDRESS: "encoder"}
+
+
+def run_firmware(timeline, duration):
+    sim = Simulation(timeline, duration=duration).install()
+    with contextlib.redirect_stdout(io.StringIO()):
+        sim.run_code()
+    return sim
+
+
+def device_name(address, data):
+    name = _DEVICES.get(address, "0x%02x" % address)
+    if address == ENCODER_ADDRESS and data[:1] == bytes([_SEESAW_NEOPIXEL_BASE]):
+        name = "encoder_led"
+    return name
+
+
+def bus_bytes(sim, since, until):
+    """I2C bytes per device between two times"""
+    totals = {}
+    for at, bus, address, _direction, data in sim.bus:
+        if bus == "i2c" and since <= at < until:
+            name = device_name(address, data)
+            totals[name] = totals.get(name, 0) + len(data)
+    return totals
+
+
+def ms(seconds):
+    return round(seconds * 1000, 3)
+
+
+def bench_key_latency(taps):
+    """Taps layer 0 keys in turn and times each press to its first
+    keyboard report"""
+    script = [(0.2 + i * TAP_INTERVAL + (i % TAP_PHASES) * TAP_PHASE_STEP, "tap", i % 16)
+              for i in range(taps)]
+    sim = run_firmware(script, duration=0.2 + taps * TAP_INTERVAL + 0.3)
+    from keybow_bench import percentile
+
+    reports = [at for at, device, _report in sim.hid if device == "keyboard"]
+    latencies = []
+    for at, action, _key in sim.inputs:
+        if action == "press":
+            following = [sent for sent in reports if sent >= at]
+            if following:
+                latencies.append(following[0] - at)
+    loops = [b - a for a, b in zip(sim.scans, sim.scans[1:])]
+    return {
+        "key_to_report_ms": {"p50": ms(percentile(latencies, 0.5)),
+                             "p99": ms(percentile(latencies, 0.99))},
+        "key_presses_reported": len(latencies),
+        "loop_ms": {"p50": ms(percentile(loops, 0.5)),
+                    "p99": ms(percentile(loops, 0.99))},
+    }
+
+
+class BusWatch(Simulation):
+    """Notes when, before the layer switch, code.py's bus manager last
+    ran out of queued writes: start-up LED and OLED frames are sent in
+    slices over the first few ticks"""
+
+    idle_from = None
+
+    def advance(self):
+        super().advance()
+        now = time.monotonic()
+        if now >= self.t0 + LAYER_SWITCH_AT:
+            return
+        bus = self.namespace.get("i2c")
+        if hasattr(bus, "queued_bytes") and bus.queued_bytes():
+            self.idle_from = None
+        elif self.idle_from is None:
+            self.idle_from = now
+
+
+def bench_bus():
+    """Idle polling cost, and the cost of one layer switch"""
+    sim = BusWatch([(LAYER_SWITCH_AT, "click")], duration=LAYER_SWITCH_AT + LAYER_SWITCH_SETTLE).install()
+    with contextlib.redirect_stdout(io.StringIO()):
+        sim.run_code()
+    switch_at = sim.t0 + LAYER_SWITCH_AT
+    # Idle from the first scan with nothing left to send
+    idle_scans = [at for at in sim.scans if sim.idle_from <= at < switch_at]
+    # Every device, so traffic starting on an idle one shows as a change
+    idle = dict.fromkeys(_DEVICES.values(), 0)
+    idle.update(bus_bytes(sim, idle_scans[0], idle_scans[-1]))
+    seconds = idle_scans[-1] - idle_scans[0]
+    # Per second rather than per loop: the encoder is polled at its own
+    # rate, so bytes per loop depend on how the tasks happen to line up
+    per_second = {name: round(count / seconds) for name, count in idle.items()}
+    switch = bus_bytes(sim, switch_at, sim.t0 + sim.duration + 1)
+    # Polling carries on during the switch; only count what the switch adds
+    switch.pop("encoder", None)
+    return {"idle_bytes_per_s": per_second,
+            "layer_switch_bytes": switch}
+
+
+@contextlib.contextmanager
+def gc_paused():
+    """CPython's garbage collector pauses say nothing about the board, so
+    they are kept out of scan and macro timings"""
+    gc.collect()
+    gc.disable()
+    try:
+        yield
+    finally:
+        gc.enable()
+
+
+def bench_scan(iterations):
+    """Times keybow.update() while keys are pressed and released in turn"""
+    sim = Simulation(duration=3600, peripherals=False).install()
+    from keybow_bench import percentile
+    from keybow_sim.platform import SimulatedKeypad
+    from pmk import PMK
+
+    keybow = PMK(SimulatedKeypad(sim))
+    fastest = [None] * iterations
+    with gc_paused():
+        for _ in range(SCAN_BATCHES):
+            sim.keys[:] = [False] * NUM_KEYS
+            for i in range(iterations):
+                edge = i // SCAN_EDGE_EVERY
+                sim.keys[edge // 2 % NUM_KEYS] = edge % 2 == 0
+                start = time.monotonic_ns()
+                keybow.update()
+                ns = time.monotonic_ns() - start
+                if fastest[i] is None or ns < fastest[i]:
+                    fastest[i] = ns
+    return {"p50": round(percentile(fastest, 0.5) / 1000, 1),
+            "p99": round(percentile(fastest, 0.99) / 1000, 1)}
+
+
+def bench_macros(iterations):
+    Simulation(duration=3600).install()
+    from keybow_bench import time_macro
+    from macro_handler import MacroHandler, ReportRecorder
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        from config import layers
+    macro_comm = MacroHandler(keyboard_device=ReportRecorder())
+    totals = {}
+    macros = [macro for layer in layers.values() for entry in layer.values()
+              for macro in (entry.values() if isinstance(entry, dict) else (entry,))]  # Tap/hold keys
+    for macro in macros:
+        if macro[0] not in ("TEXT", "UTF16", "MOD+"):
+            continue
+        # Compiled and send_macro() batches take turns
+        compiled, direct = [], []
+        with gc_paused():
+            for _ in range(MACRO_BATCHES):
+                reports, ns = time_macro(macro_comm, macro, iterations // MACRO_BATCHES)
+                compiled.append(ns)
+                _, ns = time_macro(macro_comm, macro, iterations // MACRO_BATCHES, compiled=False)
+                direct.append(ns)
+        total = totals.setdefault(macro[0], [0, 0, 0, 0])
+        total[0] += 1
+        total[1] += reports
+        total[2] += statistics.median(compiled)
+        total[3] += statistics.median(direct)
+    # Per macro type, since single macros are too quick to time steadily
+    return {kind: {"macros": count,
+                   "reports": reports,
+                   "compiled_reports_per_s": round(reports * 1e9 / compiled_ns),
+                   "send_macro_reports_per_s": round(reports * 1e9 / direct_ns),
+                   "compiled_speedup": round(direct_ns / compiled_ns, 2)}
+            for kind, (count, reports, compiled_ns, direct_ns) in totals.items()}
+
+
+def bench_midi():
+    """MIDI sent when the same MIDI keys are tapped again; every tap
+    must send its messages"""
+    timeline = Timeline.from_file(os.path.join(TIMELINES, "midi_retrigger.txt"))
+    sim = run_firmware(timeline, duration=timeline.end + 0.3)
+    return {"retrigger_bytes": sum(len(data) for _at, data in sim.midi)}
+
+
+def run(taps, iterations):
+    return {
+        "firmware": bench_key_latency(taps),
+        "bus": bench_bus(),
+        "midi": bench_midi(),
+        "scan_us": bench_scan(iterations),
+        "macros": bench_macros(iterations),
+    }
+
+
+def median_of(runs, prefix=""):
+    """Combines repeated runs: the median of each timing, and the first
+    run's counts"""
+    merged = {}
+    for key, value in runs[0].items():
+        name = prefix + key
+        values = [run[key] for run in runs if key in run]
+        if isinstance(value, dict):
+            merged[key] = median_of(values, name + "/")
+        elif is_timing(name):
+            merged[key] = statistics.median(values)
+        else:
+            merged[key] = value
+    return merged
+
+
+def flatten(results, prefix=""):
+    flat = {}
+    for key, value in results.items():
+        if isinstance(value, dict):
+            flat.update(flatten(value, prefix + key + "/"))
+        else:
+            flat[prefix + key] = value
+    return flat
+
+
+def is_timing(name):
+    return ("_ms/" in name or "_us/" in name or name.endswith("_per_s") or "_per_s/" in name
+            or name.endswith("_speedup"))
+
+
+def is_rate(name):
+    return name.endswith("_per_s") and not name.startswith("bus/")
+
+
+def compare(baseline, results):
+    """Lists the metrics that moved; returns True if any regressed"""
+    old, new = flatten(baseline), flatten(results)
+    regressed = False
+    for name in sorted(set(old) | set(new)):
+        before, after = old.get(name), new.get(name)
+        if before == after:
+            continue
+        if before is None or after is None:
+            print("%-60s %s -> %s" % (name, before, after))
+            continue
+        change = (after - before) / before if before else float("inf") if after > before else float("-inf")
+        if is_timing(name) and abs(change) <= TIMING_TOLERANCE:
+            continue
+        if is_rate(name) or name.endswith("_speedup") or name.endswith("_reported"):
+            worse = change < 0  # Rates, speedups and counts of handled inputs should not fall
+        elif name.startswith("bus/") or is_timing(name):
+            worse = change > 0  # Times and bus traffic should not rise
+        else:
+            worse = True  # Any other count changing means the output changed
+        regressed = regressed or worse
+        print("%-48s %10s -> %-10s %+5.0f%%%s" % (name, before, after, change * 100,
+                                                 "  REGRESSED" if worse else ""))
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--baseline", default=BASELINE, help="baseline JSON file")
+    parser.add_argument("--save", action="store_true", help="store the results as the new baseline")
+    parser.add_argument("--taps", type=int, default=200, help="key taps for the latency run")
+    parser.add_argument("--iterations", type=int, default=200, help="repeats for scan and macro timings")
+    parser.add_argument("--runs", type=int, default=3, help="runs to take the median timings from")
+    args = parser.parse_args()
+
+    results = median_of([run(args.taps, args.iterations) for _ in range(args.runs)])
+    print(json.dumps(results, indent=2, sort_keys=True))
+    if args.save:
+        with open(args.baseline, "w") as baseline:
+            json.dump(results, baseline, indent=2, sort_keys=True)
+            baseline.write("\n")
+        return
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as baseline:
+            print("\nChanges from %s:" % os.path.relpath(args.baseline))
+            if compare(json.load(baseline), results):
+                sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+"""
+Host-side simulator for the Keybow2040 macropad firmware.
+
+Runs the unmodified CIRCUITPY/code.py, config.py and libraries under
+CPython. The CircuitPython core modules (board, busio, digitalio,
+usb_hid, usb_midi, ...) are replaced by the fakes in `fakes/`. The
+Adafruit driver libraries run for real, using the pure-Python releases
+listed in sim/requirements.txt. They talk to register-level models of
+the IS31FL3731, SSD1306, Seesaw encoder and TCA9555 on a fake I2C bus.
+
+Key presses, encoder turns and encoder button clicks come from a
+scripted timeline (see `timeline`). Every I2C and SPI transaction, HID
+report and MIDI write is recorded with its `time.monotonic()` timestamp,
+on a simulated clock that counts the firmware's CPU time and sleeps but
+not the host's stalls (see `clock`).
+
+    from keybow_sim import Simulation
+    sim = Simulation(timeline="0.1 tap 3\\n0.5 rotate 2", duration=1.0)
+    sim.install()
+    sim.run_code()
+    print(sim.summary())
+"""
+
+import os
+import sys
+import time
+
+from . import clock
+from .devices import IS31FL3731, SSD1306, Seesaw, TCA9555
+from .timeline import Timeline
+
+SIM_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ROOT = os.path.dirname(SIM_DIR)
+CIRCUITPY = os.path.join(ROOT, "CIRCUITPY")
+LIB = os.path.join(CIRCUITPY, "lib")
+FAKES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fakes")
+
+NUM_KEYS = 16
+
+# I2C addresses used by the macropad
+LED_ADDRESS = 0x74
+OLED_ADDRESS = 0x3D
+ENCODER_ADDRESS = 0x36
+EXPANDER_ADDRESS = 0x20
+
+_current = None
+
+
+class SimulationDone(Exception):
+    """Raised inside the firmware once the timeline and duration have run out"""
+
+
+def current():
+    """Returns the installed Simulation, for use by the fake modules"""
+    if _current is None:
+        raise RuntimeError("No simulation installed, call Simulation.install() first")
+    return _current
+
+
+class Simulation:
+    """
+    Simulated macropad hardware, fed by a timeline of input events.
+
+    :param timeline: a Timeline, timeline text, or list of event tuples
+    :param duration: seconds to run after the first switch scan; defaults
+        to half a second after the last timeline event
+    :param platform: "keybow2040" (switches on GPIO, IS31FL3731 LEDs) or
+        "rgbkeypadbase" (TCA9555 switches, Dotstar LEDs on SPI)
+    :param peripherals: add the OLED and Seesaw encoder to the I2C bus
+    """
+
+    def __init__(self, timeline=(), duration=None, platform="keybow2040", peripherals=True):
+        if not isinstance(timeline, Timeline):
+            timeline = Timeline(timeline)
+        self.timeline = timeline
+        self.duration = timeline.end + 0.5 if duration is None else duration
+        self.platform = platform
+        self.keys = [False] * NUM_KEYS
+        self.devices = {}
+        if platform == "keybow2040":
+            self.devices[LED_ADDRESS] = IS31FL3731()
+        elif platform == "rgbkeypadbase":
+            self.devices[EXPANDER_ADDRESS] = TCA9555(self)
+        else:
+            raise ValueError("Unknown platform: " + repr(platform))
+        if peripherals:
+            self.devices[OLED_ADDRESS] = SSD1306()
+            self.devices[ENCODER_ADDRESS] = Seesaw()
+        self.pins = {}
+        # Board pins wired to a device's INT output: {pin name: I2C address}
+        self.interrupts = {}
+        # Records, all stamped with time.monotonic()
+        self.bus = []     # (time, bus, address, "write"/"read", bytes)
+        self.hid = []     # (time, device name, report bytes)
+        self.midi = []    # (time, bytes)
+        self.inputs = []  # (time, action, argument), as applied
+        self.scans = []   # time of each full switch scan
+        self.start = None
+        self.t0 = None
+        # Globals of the running code.py, from run_code()
+        self.namespace = {}
+        self._next_event = 0
+
+    # Set up and run
+
+    def install(self):
+        """Makes this the current simulation, starts a new simulated
+        clock, puts the fakes and the CIRCUITPY libraries on sys.path and
+        unloads any CIRCUITPY modules left over from an earlier
+        simulation"""
+        global _current
+        _current = self
+        clock.install(clock.Clock())
+        if FAKES not in sys.path:
+            sys.path.insert(0, FAKES)
+        # Appended, so the pure-Python Adafruit libraries from
+        # site-packages win over the .mpy bundle in CIRCUITPY/lib.
+        for path in (LIB, CIRCUITPY):
+            if path not in sys.path:
+                sys.path.append(path)
+        # Forget modules imported from the drive by an earlier simulation,
+        # so each one boots from fresh module state, as after a reload on
+        # the board
+        for name, module in list(sys.modules.items()):
+            if (getattr(module, "__file__", None) or "").startswith(CIRCUITPY + os.sep):
+                del sys.modules[name]
+        self.start = time.monotonic()
+        return self
+
+    def run_code(self, path=None):
+        """Runs code.py (or another script) from the CIRCUITPY directory
+        until the simulation is done"""
+        if path is None:
+            path = os.path.join(CIRCUITPY, "code.py")
+        cwd = os.getcwd()
+        os.chdir(CIRCUITPY)  # Fonts and other files are opened relative to the drive
+        try:
+            with open(path) as source:
+                code = compile(source.read(), path, "exec")
+            # Kept in the simulation, so its globals can be looked at
+            # while the script runs
+            self.namespace = {"__name__": "__main__", "__file__": path}
+            exec(code, self.namespace)
+        except SimulationDone:
+            pass
+        finally:
+            os.chdir(cwd)
+
+    # Inputs
+
+    def advance(self):
+        """Applies timeline events that are due. Called on every switch
+        read; raises SimulationDone when the run is over"""
+        now = time.monotonic()
+        if self.t0 is None:
+            self.t0 = now  # The timeline starts at the first switch scan
+        events = self.timeline.events
+        while self._next_event < len(events) and self.t0 + events[self._next_event][0] <= now:
+            at, action, argument = events[self._next_event]
+            self._apply(action, argument)
+            self.inputs.append((self.t0 + at, action, argument))
+            self._next_event += 1
+        if now - self.t0 > self.duration:
+            raise SimulationDone()
+
+    def _apply(self, action, argument):
+        if action == "press":
+            self.keys[argument] = True
+        elif action == "release":
+            self.keys[argument] = False
+        elif action == "rotate":
+            self.devices[ENCODER_ADDRESS].rotate(argument)
+        elif action == "button":
+            self.devices[ENCODER_ADDRESS].set_button(argument)
+
+    def switch(self, idx):
+        """State of a key switch, True when pressed"""
+        self.advance()
+        if idx == 0:
+            # Scans read the switches in order, so switch 0 marks a new one
+            self.scans.append(time.monotonic())
+        return self.keys[idx]
+
+    def switch_bits(self):
+        """States of all key switches as a bitmask"""
+        self.advance()
+        self.scans.append(time.monotonic())
+        bits = 0
+        for idx, pressed in enumerate(self.keys):
+            if pressed:
+                bits |= 1 << idx
+        return bits
+
+    # Outputs, called by the fakes
+
+    def record_bus(self, bus, address, direction, data):
+        self.bus.append((time.monotonic(), bus, address, direction, bytes(data)))
+
+    def record_hid(self, device, report):
+        self.hid.append((time.monotonic(), device, bytes(report)))
+
+    def record_midi(self, data):
+        self.midi.append((time.monotonic(), bytes(data)))
+
+    # Results
+
+    def bus_bytes(self, since=None, until=None):
+        """Bytes moved on each bus address between two times, as a
+        dictionary {(bus, address): bytes}"""
+        totals = {}
+        for at, bus, address, _direction, data in self.bus:
+            if (since is None or at >= since) and (until is None or at < until):
+                totals[(bus, address)] = totals.get((bus, address), 0) + len(data)
+        return totals
+
+    def summary(self):
+        """Short text report of what the firmware did"""
+        lines = ["inputs applied: %d" % len(self.inputs),
+                 "HID reports: %d" % len(self.hid),
+                 "MIDI writes: %d" % len(self.midi)]
+        for (bus, address), count in sorted(self.bus_bytes().items(), key=str):
+            if address is None:
+                lines.append("%s: %d bytes" % (bus, count))
+            else:
+                lines.append("%s 0x%02x: %d bytes" % (bus, address, count))
+        return "\n".join(lines)
@@ -0,0 +1,103 @@
+"""
+Simulated clock for the firmware.
+
+While a simulation is installed, `time.monotonic()`, `time.monotonic_ns()`
+and `time.sleep()` run on a `Clock` instead of the host's wall clock. The
+clock moves on by the CPU time the process uses, and by every sleep,
+which returns at once. asyncio's event loop waits on the same clock, so
+the firmware's tasks wake exactly when they are due.
+
+Timings then count the firmware's own work and its scheduling, but not
+the time the host spends running something else, which on a shared
+machine adds stalls of several milliseconds at random. The CPU speed of
+such a host also moves by as much as 2x from one second to the next, so
+the clock times a fixed reference loop every few milliseconds of CPU
+time and counts CPU time as it would be on a host that runs the loop in
+NOMINAL_REFERENCE_NS.
+"""
+
+import asyncio
+import selectors
+import time
+
+REFERENCE_LOOPS = 5000
+NOMINAL_REFERENCE_NS = 300000  # About a current desktop CPU
+CALIBRATION_INTERVAL_NS = 10000000
+
+_current = None
+
+
+def reference_loop():
+    total = 0
+    for i in range(REFERENCE_LOOPS):
+        total += i & 7
+    return total
+
+
+class Clock:
+    """Sleeps, plus CPU time at the nominal host speed, since the clock
+    was made"""
+
+    def __init__(self):
+        self._slept = 0
+        self._counted = 0  # Scaled CPU time before the current stretch
+        self._since = time.thread_time_ns()
+        self._scale = 1.0
+        self._calibrate(self._since)
+
+    def monotonic_ns(self):
+        cpu = time.thread_time_ns()
+        if cpu - self._since >= CALIBRATION_INTERVAL_NS:
+            self._calibrate(cpu)
+            cpu = self._since
+        return self._slept + self._counted + int((cpu - self._since) * self._scale)
+
+    def sleep(self, seconds):
+        if seconds > 0:
+            self._slept += int(seconds * 1e9)
+
+    def _calibrate(self, cpu):
+        # The reference loop's own CPU time isn't counted
+        self._counted += int((cpu - self._since) * self._scale)
+        start = time.thread_time_ns()
+        reference_loop()
+        self._since = time.thread_time_ns()
+        self._scale = NOMINAL_REFERENCE_NS / max(self._since - start, 1)
+
+
+# Stand-ins for the time module's functions. Libraries that bind them
+# with `from time import sleep` keep working across simulations.
+
+def monotonic():
+    return _current.monotonic_ns() / 1e9
+
+
+def monotonic_ns():
+    return _current.monotonic_ns()
+
+
+def sleep(seconds):
+    _current.sleep(seconds)
+
+
+class _Selector(selectors.DefaultSelector):
+    # Waiting for the next timer is a sleep on the simulated clock
+    def select(self, timeout=None):
+        if timeout:
+            sleep(timeout)
+        return super().select(0)
+
+
+class _EventLoopPolicy(asyncio.DefaultEventLoopPolicy):
+    def new_event_loop(self):
+        return asyncio.SelectorEventLoop(_Selector())
+
+
+def install(clock):
+    """Puts the time module and asyncio on a clock"""
+    global _current
+    _current = clock
+    time.monotonic = monotonic
+    time.monotonic_ns = monotonic_ns
+    time.sleep = sleep
+    asyncio.set_event_loop_policy(_EventLoopPolicy())
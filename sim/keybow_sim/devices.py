@@ -0,0 +1,276 @@
+"""
+Register-level models of the I2C devices on the macropad.
+
+Each model takes the raw bytes of I2C writes and answers reads the way
+the chip would, closely enough for the Adafruit drivers to run. They
+also keep the state the firmware has set up, such as LED brightness
+registers and OLED memory, so it can be inspected after a run.
+"""
+
+import struct
+
+
+class I2CModel:
+    """Base class for simulated I2C devices"""
+
+    def write(self, data):
+        pass
+
+    def read(self, count):
+        return bytes(count)
+
+
+class IS31FL3731(I2CModel):
+    """
+    IS31FL3731 LED matrix driver: eight frames of registers plus the
+    function (config) bank, selected by writing to register 0xFD
+    """
+
+    BANK_REGISTER = 0xFD
+    CONFIG_BANK = 0x0B
+    FRAME_REGISTER = 0x01
+    COLOR_OFFSET = 0x24
+
+    def __init__(self):
+        self.bank = 0
+        self.pointer = 0
+        self.banks = [bytearray(256) for _ in range(self.CONFIG_BANK + 1)]
+
+    def write(self, data):
+        if not data:
+            return
+        self.pointer = data[0]
+        if data[0] == self.BANK_REGISTER and len(data) > 1:
+            self.bank = data[1] % len(self.banks)
+            return
+        registers = self.banks[self.bank]
+        for offset, value in enumerate(data[1:]):
+            registers[(data[0] + offset) & 0xFF] = value
+
+    def read(self, count):
+        if self.pointer == self.BANK_REGISTER:
+            return bytes([self.bank]) + bytes(count - 1)
+        return bytes(self.banks[self.bank][self.pointer:self.pointer + count])
+
+    @property
+    def frame(self):
+        """The frame being displayed"""
+        return self.banks[self.CONFIG_BANK][self.FRAME_REGISTER] & 0x07
+
+    def brightness(self, address, frame=None):
+        """PWM value of one LED, by its pixel_addr() address"""
+        if frame is None:
+            frame = self.frame
+        return self.banks[frame][self.COLOR_OFFSET + address]
+
+
+class SSD1306(I2CModel):
+    """
+    SSD1306 OLED controller in horizontal addressing mode, with the
+    column and page address window commands
+    """
+
+    SET_COL_ADDR = 0x21
+    SET_PAGE_ADDR = 0x22
+    # Commands followed by one argument byte
+    ONE_ARGUMENT = (0x20, 0x81, 0x8D, 0xA8, 0xD3, 0xD5, 0xD9, 0xDA, 0xDB)
+
+    def __init__(self, width=128, height=64):
+        self.width = width
+        self.pages = height // 8
+        self.ram = bytearray(width * self.pages)
+        self.col_start, self.col_end = 0, width - 1
+        self.page_start, self.page_end = 0, self.pages - 1
+        self.column, self.page = 0, 0
+        self.display_on = False
+        self._commands = []
+
+    def write(self, data):
+        if not data:
+            return
+        if data[0] & 0x40:  # D/C# set: display data
+            for value in data[1:]:
+                self.ram[self.page * self.width + self.column] = value
+                self.column += 1
+                if self.column > self.col_end:
+                    self.column = self.col_start
+                    self.page += 1
+                    if self.page > self.page_end:
+                        self.page = self.page_start
+            return
+        self._commands.extend(data[1:])
+        self._run_commands()
+
+    def _run_commands(self):
+        commands = self._commands
+        while commands:
+            command = commands[0]
+            if command in (self.SET_COL_ADDR, self.SET_PAGE_ADDR):
+                if len(commands) < 3:
+                    return
+                start, end = commands[1], commands[2]
+                if command == self.SET_COL_ADDR:
+                    self.col_start, self.col_end = start, end
+                    self.column = start
+                else:
+                    self.page_start, self.page_end = start, end
+                    self.page = start
+                del commands[:3]
+            elif command in self.ONE_ARGUMENT:
+                if len(commands) < 2:
+                    return
+                del commands[:2]
+            else:
+                if command in (0xAE, 0xAF):
+                    self.display_on = command == 0xAF
+                del commands[:1]
+
+    def pixel(self, x, y):
+        return (self.ram[(y // 8) * self.width + x] >> (y % 8)) & 1
+
+    def render(self):
+        """The display contents as text, one character per pixel"""
+        rows = []
+        for y in range(self.pages * 8):
+            rows.append("".join("#" if self.pixel(x, y) else "." for x in range(self.width)))
+        return "\n".join(rows)
+
+
+class Seesaw(I2CModel):
+    """
+    Adafruit I2C rotary encoder (product 4991): an ATtiny817 running the
+    seesaw firmware, with the encoder switch on pin 24 and a NeoPixel
+    on pin 6
+    """
+
+    HW_ID = 0x87
+    PRODUCT_ID = 4991
+    BUTTON_PIN = 24
+
+    STATUS_BASE = 0x00
+    GPIO_BASE = 0x01
+    NEOPIXEL_BASE = 0x0E
+    ENCODER_BASE = 0x11
+
+    def __init__(self):
+        self.register = (0, 0)
+        self.position = 0
+        self.delta = 0
+        self.button = False
+        self.gpio_interrupts = 0
+        self.gpio_flags = 0
+        self.encoder_interrupt = False
+        self.neopixel = bytearray(3)
+        self._last_pins = self.pins()
+
+    def rotate(self, steps):
+        self.position += steps
+        self.delta += steps
+
+    def set_button(self, pressed):
+        self.button = bool(pressed)
+        pins = self.pins()
+        self.gpio_flags |= (pins ^ self._last_pins) & self.gpio_interrupts
+        self._last_pins = pins
+
+    def pins(self):
+        """GPIO input levels; the button pulls its pin low when pressed"""
+        return 0xFFFFFFFF & ~((1 << self.BUTTON_PIN) if self.button else 0)
+
+    @property
+    def interrupt(self):
+        """True while the INT line would be asserted (pulled low)"""
+        return bool(self.gpio_flags) or (self.encoder_interrupt and self.delta != 0)
+
+    def write(self, data):
+        if len(data) < 2:
+            return
+        base, register = data[0], data[1]
+        self.register = (base, register)
+        payload = bytes(data[2:])
+        if base == self.GPIO_BASE and len(payload) >= 4:
+            pins = struct.unpack(">I", payload[:4])[0]
+            if register == 0x08:
+                self.gpio_interrupts |= pins
+            elif register == 0x09:
+                self.gpio_interrupts &= ~pins
+        elif base == self.ENCODER_BASE:
+            if register == 0x30 and len(payload) == 4:
+                self.position = struct.unpack(">i", payload)[0]
+            elif register == 0x10:
+                self.encoder_interrupt = True
+            elif register == 0x20:
+                self.encoder_interrupt = False
+        elif base == self.NEOPIXEL_BASE and register == 0x04 and len(payload) > 2:
+            offset = (payload[0] << 8) | payload[1]
+            pixels = payload[2:]
+            end = offset + len(pixels)
+            if end > len(self.neopixel):
+                self.neopixel.extend(bytes(end - len(self.neopixel)))
+            self.neopixel[offset:end] = pixels
+
+    def read(self, count):
+        base, register = self.register
+        value = b""
+        if base == self.STATUS_BASE:
+            if register == 0x01:
+                value = bytes([self.HW_ID])
+            elif register == 0x02:
+                value = struct.pack(">I", self.PRODUCT_ID << 16)
+        elif base == self.GPIO_BASE:
+            if register == 0x04:
+                value = struct.pack(">I", self.pins()) + bytes(4)
+            elif register == 0x0A:
+                value = struct.pack(">I", self.gpio_flags)
+                self.gpio_flags = 0
+        elif base == self.ENCODER_BASE:
+            if register == 0x30:
+                value = struct.pack(">i", self.position)
+            elif register == 0x40:
+                value = struct.pack(">i", self.delta)
+                self.delta = 0
+        return (value + bytes(count))[:count]
+
+
+class TCA9555(I2CModel):
+    """
+    TCA9555 16-bit I/O expander on the Pico RGB Keypad Base. Inputs read
+    low while their key is pressed, and reading the input ports clears
+    the interrupt.
+    """
+
+    def __init__(self, simulation):
+        self._simulation = simulation
+        self._rotated = None
+        self.pointer = 0
+        self._last_read = None
+
+    def ports(self):
+        # Physical port bits, from the logical (Keybow-oriented) key states
+        if self._rotated is None:
+            from pmk.platform.rgbkeypadbase import _ROTATED
+            self._rotated = _ROTATED
+        bits = self._simulation.switch_bits()
+        pressed = 0
+        for key, bit in self._rotated.items():
+            if bits & (1 << key):
+                pressed |= 1 << bit
+        return ~pressed & 0xFFFF
+
+    @property
+    def interrupt(self):
+        """True while the INT line would be asserted (pulled low)"""
+        return self._last_read is None or self.ports() != self._last_read
+
+    def write(self, data):
+        if data:
+            self.pointer = data[0]
+
+    def read(self, count):
+        if self.pointer in (0, 1):
+            ports = self.ports()
+            self._last_read = ports
+            value = bytes([ports & 0xFF, ports >> 8])[self.pointer:]
+        else:
+            value = b""
+        return (value + bytes(count))[:count]
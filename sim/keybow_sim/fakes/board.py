@@ -0,0 +1,39 @@
+"""Fake `board` module: pin names for the Keybow 2040 and Raspberry Pi Pico"""
+
+from microcontroller import Pin
+
+SW0 = Pin("SW0", switch=0)
+SW1 = Pin("SW1", switch=1)
+SW2 = Pin("SW2", switch=2)
+SW3 = Pin("SW3", switch=3)
+SW4 = Pin("SW4", switch=4)
+SW5 = Pin("SW5", switch=5)
+SW6 = Pin("SW6", switch=6)
+SW7 = Pin("SW7", switch=7)
+SW8 = Pin("SW8", switch=8)
+SW9 = Pin("SW9", switch=9)
+SW10 = Pin("SW10", switch=10)
+SW11 = Pin("SW11", switch=11)
+SW12 = Pin("SW12", switch=12)
+SW13 = Pin("SW13", switch=13)
+SW14 = Pin("SW14", switch=14)
+SW15 = Pin("SW15", switch=15)
+
+SCL = Pin("SCL")
+SDA = Pin("SDA")
+INT = Pin("INT")
+USER_SW = Pin("USER_SW")
+
+for _number in range(29):
+    globals()["GP%d" % _number] = Pin("GP%d" % _number)
+
+_i2c = None
+
+
+def I2C():
+    """The board's shared I2C bus"""
+    global _i2c
+    if _i2c is None:
+        import busio
+        _i2c = busio.I2C(SCL, SDA)
+    return _i2c
@@ -0,0 +1,80 @@
+"""Fake `busio` module: I2C transactions go to the simulation's device
+models, and every transaction is recorded"""
+
+import errno
+
+import keybow_sim
+
+
+class I2C:
+    def __init__(self, scl, sda, *, frequency=100000, timeout=255):
+        self._locked = False
+
+    def try_lock(self):
+        if self._locked:
+            return False
+        self._locked = True
+        return True
+
+    def unlock(self):
+        self._locked = False
+
+    def deinit(self):
+        pass
+
+    def scan(self):
+        return sorted(keybow_sim.current().devices)
+
+    def _device(self, address):
+        device = keybow_sim.current().devices.get(address)
+        if device is None:
+            raise OSError(errno.ENODEV, "No I2C device at address 0x%02x" % address)
+        return device
+
+    def writeto(self, address, buffer, *, start=0, end=None):
+        device = self._device(address)
+        data = bytes(buffer[start:end])
+        keybow_sim.current().record_bus("i2c", address, "write", data)
+        device.write(data)
+
+    def readfrom_into(self, address, buffer, *, start=0, end=None):
+        device = self._device(address)
+        if end is None:
+            end = len(buffer)
+        data = device.read(end - start)
+        buffer[start:end] = data
+        keybow_sim.current().record_bus("i2c", address, "read", data)
+
+    def writeto_then_readfrom(self, address, out_buffer, in_buffer, *,
+                              out_start=0, out_end=None, in_start=0, in_end=None):
+        self.writeto(address, out_buffer, start=out_start, end=out_end)
+        self.readfrom_into(address, in_buffer, start=in_start, end=in_end)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.deinit()
+
+
+class SPI:
+    def __init__(self, clock, MOSI=None, MISO=None):
+        self._locked = False
+
+    def try_lock(self):
+        if self._locked:
+            return False
+        self._locked = True
+        return True
+
+    def unlock(self):
+        self._locked = False
+
+    def configure(self, *, baudrate=100000, polarity=0, phase=0, bits=8):
+        pass
+
+    def deinit(self):
+        pass
+
+    def write(self, buffer, *, start=0, end=None):
+        keybow_sim.current().record_bus("spi", None, "write", bytes(buffer[start:end]))
@@ -0,0 +1,59 @@
+"""Fake `digitalio` module: key switch pins read the simulation's keys"""
+
+import keybow_sim
+
+
+class Direction:
+    INPUT = "INPUT"
+    OUTPUT = "OUTPUT"
+
+
+class Pull:
+    UP = "UP"
+    DOWN = "DOWN"
+
+
+class DriveMode:
+    PUSH_PULL = "PUSH_PULL"
+    OPEN_DRAIN = "OPEN_DRAIN"
+
+
+class DigitalInOut:
+    def __init__(self, pin):
+        self.pin = pin
+        self.direction = Direction.INPUT
+        self.pull = None
+        self.drive_mode = DriveMode.PUSH_PULL
+
+    @property
+    def value(self):
+        simulation = keybow_sim.current()
+        if self.pin.switch is not None:
+            # Switches pull their pin low while pressed
+            return not simulation.switch(self.pin.switch)
+        if self.pin.name in simulation.interrupts:
+            # INT outputs are active low
+            return not simulation.devices[simulation.interrupts[self.pin.name]].interrupt
+        return simulation.pins.get(self.pin.name, self.pull != Pull.DOWN)
+
+    @value.setter
+    def value(self, value):
+        keybow_sim.current().pins[self.pin.name] = bool(value)
+
+    def switch_to_input(self, pull=None):
+        self.direction = Direction.INPUT
+        self.pull = pull
+
+    def switch_to_output(self, value=False, drive_mode=DriveMode.PUSH_PULL):
+        self.direction = Direction.OUTPUT
+        self.drive_mode = drive_mode
+        self.value = value
+
+    def deinit(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.deinit()
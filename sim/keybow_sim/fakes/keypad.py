@@ -0,0 +1,102 @@
+"""Fake `keypad` module: Keys reports the simulation's key presses and
+releases as events, the way the background scanner would"""
+
+import time
+
+import keybow_sim
+
+
+class Event:
+    def __init__(self, key_number=0, pressed=True, timestamp=None):
+        self.key_number = key_number
+        self.pressed = pressed
+        self.timestamp = timestamp
+
+    @property
+    def released(self):
+        return not self.pressed
+
+    def __eq__(self, other):
+        return (self.key_number, self.pressed) == (other.key_number, other.pressed)
+
+    def __repr__(self):
+        return "<Event: key_number %d %s>" % (self.key_number, "pressed" if self.pressed else "released")
+
+
+class EventQueue:
+    def __init__(self, keys, max_events):
+        self._keys = keys
+        self._max_events = max_events
+        self._events = []
+        self.overflowed = False
+
+    def _append(self, key_number, pressed, at):
+        if len(self._events) >= self._max_events:
+            self.overflowed = True
+            return
+        self._events.append((key_number, pressed, int(at * 1000) & ((1 << 29) - 1)))
+
+    def get(self):
+        self._keys._scan()
+        if not self._events:
+            return None
+        return Event(*self._events.pop(0))
+
+    def get_into(self, event):
+        self._keys._scan()
+        if not self._events:
+            return False
+        event.key_number, event.pressed, event.timestamp = self._events.pop(0)
+        return True
+
+    def clear(self):
+        self._events.clear()
+        self.overflowed = False
+
+    def __len__(self):
+        self._keys._scan()
+        return len(self._events)
+
+    def __bool__(self):
+        return len(self) > 0
+
+
+class Keys:
+    """Scans the switch pins; every press and release applied by the
+    simulation becomes an event, however short, stamped with the time
+    it was applied"""
+
+    def __init__(self, pins, *, value_when_pressed, pull=True, interval=0.02, max_events=64,
+                 debounce_threshold=1):
+        self._numbers = {pin.switch: number for number, pin in enumerate(pins) if pin.switch is not None}
+        self.key_count = len(pins)
+        self.events = EventQueue(self, max_events)
+        simulation = keybow_sim.current()
+        self._seen = len(simulation.inputs)
+        self._pressed = [False] * len(pins)
+        # Keys already down when scanning starts are reported as pressed
+        self.reset()
+
+    def _scan(self):
+        simulation = keybow_sim.current()
+        simulation.switch_bits()  # Applies due inputs and records the scan
+        inputs = simulation.inputs
+        while self._seen < len(inputs):
+            at, action, argument = inputs[self._seen]
+            self._seen += 1
+            number = self._numbers.get(argument) if action in ("press", "release") else None
+            if number is not None and self._pressed[number] != (action == "press"):
+                self._pressed[number] = action == "press"
+                self.events._append(number, action == "press", at)
+
+    def reset(self):
+        # Every key is taken as released, so held keys are reported again
+        self._pressed = [False] * self.key_count
+        simulation = keybow_sim.current()
+        for switch, number in self._numbers.items():
+            if simulation.keys[switch]:
+                self._pressed[number] = True
+                self.events._append(number, True, time.monotonic())
+
+    def deinit(self):
+        pass
@@ -0,0 +1,12 @@
+"""Fake `microcontroller` module"""
+
+
+class Pin:
+    """A named pin; key switch pins know which switch they read"""
+
+    def __init__(self, name, switch=None):
+        self.name = name
+        self.switch = switch
+
+    def __repr__(self):
+        return "board." + self.name
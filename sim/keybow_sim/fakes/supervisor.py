@@ -0,0 +1,16 @@
+"""Fake `supervisor` module"""
+
+import time
+
+
+class Runtime:
+    usb_connected = True
+    serial_connected = True
+
+
+runtime = Runtime()
+
+
+def ticks_ms():
+    """Milliseconds on the time.monotonic() clock, wrapping at 2**29"""
+    return int(time.monotonic() * 1000) & ((1 << 29) - 1)
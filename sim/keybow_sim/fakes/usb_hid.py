@@ -0,0 +1,30 @@
+"""Fake `usb_hid` module: reports sent by adafruit_hid are recorded"""
+
+import keybow_sim
+
+
+class Device:
+    def __init__(self, *, report_descriptor=b"", usage_page, usage, report_ids=(0,),
+                 in_report_lengths=(0,), out_report_lengths=(0,), name="device"):
+        self.usage_page = usage_page
+        self.usage = usage
+        self.report_ids = report_ids
+        self.in_report_lengths = in_report_lengths
+        self.out_report_lengths = out_report_lengths
+        self.name = name
+        self.last_received_report = None
+
+    def send_report(self, report, report_id=None):
+        keybow_sim.current().record_hid(self.name, report)
+
+    def get_last_received_report(self, report_id=None):
+        return None
+
+
+Device.KEYBOARD = Device(usage_page=0x01, usage=0x06, in_report_lengths=(8,),
+                         out_report_lengths=(1,), name="keyboard")
+Device.MOUSE = Device(usage_page=0x01, usage=0x02, in_report_lengths=(4,), name="mouse")
+Device.CONSUMER_CONTROL = Device(usage_page=0x0C, usage=0x01, in_report_lengths=(2,),
+                                 name="consumer_control")
+
+devices = (Device.KEYBOARD, Device.MOUSE, Device.CONSUMER_CONTROL)
@@ -0,0 +1,21 @@
+"""Fake `usb_midi` module: bytes written to the MIDI out port are recorded"""
+
+import keybow_sim
+
+
+class PortIn:
+    def read(self, nbytes=None):
+        return b""
+
+    def readinto(self, buf, nbytes=None):
+        return 0
+
+
+class PortOut:
+    def write(self, buf, nbytes=None):
+        data = bytes(buf[:nbytes] if nbytes is not None else buf)
+        keybow_sim.current().record_midi(data)
+        return len(data)
+
+
+ports = (PortIn(), PortOut())
@@ -0,0 +1,50 @@
+"""
+A PMK hardware platform backed directly by the simulation, for driving
+`pmk.PMK` on the host without any bus or driver traffic:
+
+    sim = Simulation(timeline, peripherals=False).install()
+    from keybow_sim.platform import SimulatedKeypad
+    keybow = PMK(SimulatedKeypad(sim))
+
+The switches follow the timeline and the LEDs are kept in `pixels`.
+For the full firmware with modelled I2C devices, use
+`Simulation.run_code()` with the stock Keybow2040 platform instead.
+"""
+
+from pmk.platform import PMK
+from pmk.platform.display import Display
+from pmk.platform.switches import Switches
+
+from . import NUM_KEYS
+
+
+class SimulatedSwitches(Switches):
+    def __init__(self, simulation, count=NUM_KEYS):
+        self._simulation = simulation
+        self._count = count
+
+    def num_switches(self):
+        return self._count
+
+    def switch_state(self, idx):
+        return self._simulation.switch(idx)
+
+    def read_all_switches(self):
+        return self._simulation.switch_bits()
+
+
+class SimulatedDisplay(Display):
+    def __init__(self, count=NUM_KEYS):
+        self.pixels = [(0, 0, 0)] * count
+        self.writes = 0
+
+    def set_pixel(self, idx, r, g, b):
+        self.pixels[idx] = (r, g, b)
+        self.writes += 1
+
+
+class SimulatedKeypad(PMK):
+    def __init__(self, simulation):
+        self._i2c = None
+        self._switches = SimulatedSwitches(simulation)
+        self._display = SimulatedDisplay()
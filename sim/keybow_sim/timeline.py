@@ -0,0 +1,81 @@
+"""
+Scripted input timelines for the simulator.
+
+A timeline is text with one event per line, `time action [argument]`,
+with times in seconds from the first switch scan and `#` comments:
+
+    0.10 press 3
+    0.25 release 3
+    0.50 tap 5          # press, then release 50 ms later
+    0.60 tap 5 0.2      # press, then release 200 ms later
+    1.00 rotate 3       # three detents up (negative for down)
+    1.50 click          # encoder button press and release
+    2.00 button 1       # encoder button down (0 for up)
+
+Lists of `(time, action, argument)` tuples are accepted as well.
+"""
+
+DEFAULT_TAP = 0.05
+
+
+class Timeline:
+    """
+    Sorted list of (time, action, argument) input events.
+
+    :param script: timeline text, or an iterable of event tuples
+    """
+
+    def __init__(self, script=()):
+        if isinstance(script, str):
+            script = parse(script)
+        events = []
+        for event in script:
+            events.extend(expand(*event))
+        events.sort(key=lambda event: event[0])
+        self.events = events
+
+    @property
+    def end(self):
+        """Time of the last event"""
+        return self.events[-1][0] if self.events else 0.0
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path) as script:
+            return cls(script.read())
+
+
+def parse(text):
+    """Parses timeline text into (time, action, arguments...) tuples"""
+    events = []
+    for number, line in enumerate(text.splitlines(), 1):
+        line = line.split("#", 1)[0].strip()
+        if not line:
+            continue
+        fields = line.split()
+        try:
+            at = float(fields[0])
+            action = fields[1]
+            arguments = [float(field) if "." in field else int(field) for field in fields[2:]]
+        except (IndexError, ValueError):
+            raise ValueError("Timeline line %d: can't parse %r" % (number, line))
+        events.append((at, action) + tuple(arguments))
+    return events
+
+
+def expand(at, action, argument=None, length=DEFAULT_TAP):
+    """Turns one scripted event into the primitive press, release, rotate
+    and button events"""
+    if action in ("press", "release"):
+        return [(at, action, int(argument))]
+    if action == "tap":
+        return [(at, "press", int(argument)), (at + length, "release", int(argument))]
+    if action == "rotate":
+        return [(at, "rotate", int(argument))]
+    if action == "button":
+        return [(at, "button", bool(argument))]
+    if action == "click":
+        if argument is not None:
+            length = argument
+        return [(at, "button", True), (at + length, "button", False)]
+    raise ValueError("Unknown timeline action: " + repr(action))
@@ -0,0 +1,44 @@
+"""
+Runs the unmodified firmware (CIRCUITPY/code.py) on the host against
+simulated hardware, then prints what it sent.
+
+    pip install -r sim/requirements.txt
+    python sim/run.py sim/timelines/demo.txt
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from keybow_sim import Simulation, Timeline  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("timeline", nargs="?", help="timeline script (see keybow_sim.timeline)")
+    parser.add_argument("--duration", type=float, help="seconds to run after the first scan")
+    parser.add_argument("--quiet", action="store_true", help="hide the firmware's own output")
+    parser.add_argument("--hid", action="store_true", help="list every HID report")
+    parser.add_argument("--oled", action="store_true", help="draw the final OLED contents")
+    args = parser.parse_args()
+
+    timeline = Timeline.from_file(args.timeline) if args.timeline else Timeline()
+    sim = Simulation(timeline, duration=args.duration).install()
+    output = io.StringIO() if args.quiet else sys.stdout
+    with contextlib.redirect_stdout(output):
+        sim.run_code()
+
+    print(sim.summary())
+    if args.hid:
+        for at, device, report in sim.hid:
+            print("%10.4f %-16s %s" % (at - sim.t0, device, report.hex(" ")))
+    if args.oled:
+        print(sim.devices[0x3D].render())
+
+
+if __name__ == "__main__":
+    main()